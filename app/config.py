@@ -5,8 +5,85 @@ import hashlib
 MYSQL_HOST = "127.0.0.1"
 MYSQL_PORT = 3306
 MYSQL_AUTH = "root:password"
+MYSQL_POOL_MIN = 1
+MYSQL_POOL_MAX = 10
+MYSQL_POOL_PING = 30.0
+SCHEMA_AUTO_MIGRATE = True
+# 多个 worker 同时启动时排队等待迁移锁的秒数
+SCHEMA_LOCK_TIMEOUT = 300
+
+EVENTS_CACHE_SIZE = 64
+EVENTS_CACHE_TTL = 60.0
+EVENTS_CACHE_CONTROL = "public, no-cache"
+EVENTS_PAGE_SIZE = 50
+EVENTS_PAGE_MAX = 200
+EVENTS_EXPORT_BATCH = 500
+EVENTS_CHANGES_MAX = 500
 
 IMAGE_STORE = "./images"
+IMAGES_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+IMAGE_VARIANT_STORE = "./images_variants"
+IMAGE_VARIANT_LIMIT = 512 * 1024 * 1024
+IMAGE_VARIANT_MAX = 2048
+IMAGE_VARIANT_WORKERS = 2
+# 按 Accept 协商转码的目标格式，靠前的优先；留空关闭转码
+IMAGE_TRANSCODE_FORMATS = ("avif", "webp")
+
+# 与 IMAGE_STORE 放在同一文件系统，提交时才能直接 rename
+IMAGE_UPLOAD_STORE = "./images_uploads"
+IMAGE_UPLOAD_TTL = 24 * 3600.0
+IMAGE_UPLOAD_MAX = 256 * 1024 * 1024
+
+# 打包存储：不超过阈值的小图追加写入大包文件，按 哈希 -> (包, 偏移, 长度) 索引；
+# 索引在进程内，启用后只能以单个 worker 运行
+IMAGE_PACK_ENABLED = False
+IMAGE_PACK_STORE = "./images_packs"
+IMAGE_PACK_SIZE = 256 * 1024 * 1024
+IMAGE_PACK_THRESHOLD = 100 * 1024
+IMAGE_PACK_COMPACT_RATIO = 0.5
+IMAGE_PACK_COMPACT_INTERVAL = 3600.0
+
+# 图片回收：清单中超过宽限期且没有事件引用的图片视为孤立图片；
+# 后台清扫默认关闭，先用 /api/images/gc 的报告确认无误再打开
+IMAGE_GC_SWEEP = False
+IMAGE_GC_GRACE = 7 * 24 * 3600.0
+IMAGE_GC_INTERVAL = 6 * 3600.0
+IMAGE_GC_BATCH = 100
+IMAGE_GC_PAUSE = 0.2
+IMAGE_GC_REPORT_MAX = 1000
+
+IMAGE_BATCH_MAX = 500
+
+# 入库优化：去掉元数据并做无损压缩（JPEG 删段、PNG 重新 deflate），文件名仍是原始
+# 上传内容的哈希；PROGRESSIVE 额外尝试沿用量化表重编码为渐进式 JPEG，非逐位无损
+IMAGE_OPTIMIZE_ENABLED = False
+IMAGE_OPTIMIZE_PROGRESSIVE = False
+IMAGE_OPTIMIZE_WORKERS = 2
+IMAGE_OPTIMIZE_MAX = 64 * 1024 * 1024
+
+# 图片元数据目录：LQIP 占位图的最长边与提取用的进程数
+IMAGE_LQIP_SIZE = 16
+IMAGE_META_WORKERS = 1
+# 元数据查询接口每次请求最多当场提取的张数，其余转入后台
+IMAGE_META_ON_DEMAND = 4
+
+# 已存图片的布隆过滤器，判定不存在的请求不再访问磁盘；
+# 其它 worker 上传的图片要等下次重建才会进入本进程的过滤器，在此之前会被误判为不存在，
+# 启用后只能以单个 worker 运行
+IMAGE_BLOOM_ENABLED = False
+IMAGE_BLOOM_CAPACITY = 100_000
+IMAGE_BLOOM_ERROR = 0.01
+IMAGE_BLOOM_REFRESH = 600.0
+
+# 进程内图片字节缓存：总量上限、单张上限，以及被请求几次后才放入缓存
+IMAGE_MEMCACHE_LIMIT = 64 * 1024 * 1024
+IMAGE_MEMCACHE_OBJECT = 256 * 1024
+IMAGE_MEMCACHE_ADMIT = 3
+IMAGE_MEMCACHE_SKETCH = 10000
+
+IMAGE_LIST_PAGE = 200
+IMAGE_LIST_MAX = 1000
 
 ADMIN_TOKEN = "kxpage_password"
 
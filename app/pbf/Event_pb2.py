@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fpbf/Event.proto\x12\x06\x65vents\"\x85\x01\n\tEventSpec\x12\x11\n\teventUUID\x18\x01 \x01(\t\x12\x12\n\neventTitle\x18\x02 \x01(\t\x12\x18\n\x10\x65ventDescription\x18\x03 \x01(\t\x12\x11\n\teventHref\x18\x04 \x01(\t\x12\x11\n\teventTime\x18\x05 \x01(\t\x12\x11\n\timageHash\x18\x06 \x01(\t\".\n\tEventList\x12!\n\x06\x65vents\x18\x01 \x03(\x0b\x32\x11.events.EventSpec\"=\n\tEventPost\x12\r\n\x05token\x18\x01 \x01(\t\x12!\n\x06\x65vents\x18\x02 \x03(\x0b\x32\x11.events.EventSpec\"+\n\x0b\x45ventDelete\x12\r\n\x05token\x18\x01 \x01(\t\x12\r\n\x05uuids\x18\x02 \x03(\t\">\n\x0b\x45ventUpdate\x12\r\n\x05token\x18\x01 \x01(\t\x12 \n\x05\x65vent\x18\x02 \x01(\x0b\x32\x11.events.EventSpec\"\x1b\n\nAdminToken\x12\r\n\x05token\x18\x01 \x01(\t\"9\n\x0bStorageInfo\x12\x0c\n\x04size\x18\x01 \x01(\x04\x12\r\n\x05\x63ount\x18\x02 \x01(\r\x12\r\n\x05\x66iles\x18\x03 \x03(\t\"=\n\x0bImageUpload\x12\r\n\x05token\x18\x03 \x01(\t\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\r\n\x05image\x18\x02 \x01(\x0c\".\n\x0bImageDelete\x12\r\n\x05token\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\" \n\rStateResponse\x12\x0f\n\x07message\x18\x01 \x01(\tb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fpbf/Event.proto\x12\x06\x65vents\"\x85\x01\n\tEventSpec\x12\x11\n\teventUUID\x18\x01 \x01(\t\x12\x12\n\neventTitle\x18\x02 \x01(\t\x12\x18\n\x10\x65ventDescription\x18\x03 \x01(\t\x12\x11\n\teventHref\x18\x04 \x01(\t\x12\x11\n\teventTime\x18\x05 \x01(\t\x12\x11\n\timageHash\x18\x06 \x01(\t\"n\n\tEventList\x12!\n\x06\x65vents\x18\x01 \x03(\x0b\x32\x11.events.EventSpec\x12\x0e\n\x06\x63ursor\x18\x02 \x01(\t\x12\x0b\n\x03seq\x18\x03 \x01(\x04\x12!\n\x06images\x18\x04 \x03(\x0b\x32\x11.events.ImageMeta\"d\n\tImageMeta\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05width\x18\x02 \x01(\r\x12\x0e\n\x06height\x18\x03 \x01(\r\x12\x0e\n\x06\x66ormat\x18\x04 \x01(\t\x12\x0c\n\x04size\x18\x05 \x01(\x04\x12\x0c\n\x04lqip\x18\x06 \x01(\x0c\"2\n\rImageMetaList\x12!\n\x06images\x18\x01 \x03(\x0b\x32\x11.events.ImageMeta\"M\n\tEventPost\x12\r\n\x05token\x18\x01 \x01(\t\x12!\n\x06\x65vents\x18\x02 \x03(\x0b\x32\x11.events.EventSpec\x12\x0e\n\x06upsert\x18\x03 \x01(\x08\"+\n\x0b\x45ventDelete\x12\r\n\x05token\x18\x01 \x01(\t\x12\r\n\x05uuids\x18\x02 \x03(\t\">\n\x0b\x45ventUpdate\x12\r\n\x05token\x18\x01 \x01(\t\x12 \n\x05\x65vent\x18\x02 \x01(\x0b\x32\x11.events.EventSpec\"r\n\x0e\x45ventOperation\x12#\n\x06\x63reate\x18\x01 \x01(\x0b\x32\x11.events.EventSpecH\x00\x12#\n\x06update\x18\x02 \x01(\x0b\x32\x11.events.EventSpecH\x00\x12\x10\n\x06\x64\x65lete\x18\x03 \x01(\tH\x00\x42\x04\n\x02op\"G\n\nEventBatch\x12\r\n\x05token\x18\x01 \x01(\t\x12*\n\noperations\x18\x02 \x03(\x0b\x32\x16.events.EventOperation\":\n\x10\x45ventBatchResult\x12&\n\x07results\x18\x01 \x03(\x0b\x32\x15.events.StateResponse\"`\n\x0b\x45ventChange\x12\x0b\n\x03seq\x18\x01 \x01(\x04\x12\x11\n\teventUUID\x18\x02 \x01(\t\x12\x0f\n\x07\x64\x65leted\x18\x03 \x01(\x08\x12 \n\x05\x65vent\x18\x04 \x01(\x0b\x32\x11.events.EventSpec\"O\n\x0c\x45ventChanges\x12$\n\x07\x63hanges\x18\x01 \x03(\x0b\x32\x13.events.EventChange\x12\x0b\n\x03seq\x18\x02 \x01(\x04\x12\x0c\n\x04more\x18\x03 \x01(\x08\"\x1b\n\nAdminToken\x12\r\n\x05token\x18\x01 \x01(\t\"L\n\x0cStorageQuery\x12\r\n\x05token\x18\x01 \x01(\t\x12\x0e\n\x06prefix\x18\x02 \x01(\t\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\x12\r\n\x05limit\x18\x04 \x01(\r\"J\n\x0bStorageFile\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x04\x12\r\n\x05mtime\x18\x03 \x01(\x01\x12\x10\n\x08original\x18\x04 \x01(\x04\"\x81\x01\n\x0bStorageInfo\x12\x0c\n\x04size\x18\x01 \x01(\x04\x12\r\n\x05\x63ount\x18\x02 \x01(\r\x12\r\n\x05\x66iles\x18\x03 \x03(\t\x12\x0e\n\x06\x63ursor\x18\x04 \x01(\t\x12$\n\x07\x65ntries\x18\x05 \x03(\x0b\x32\x13.events.StorageFile\x12\x10\n\x08original\x18\x06 \x01(\x04\"=\n\x0bImageUpload\x12\r\n\x05token\x18\x03 \x01(\t\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\r\n\x05image\x18\x02 \x01(\x0c\".\n\x0fImageUploadInit\x12\r\n\x05token\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x04\"C\n\x12ImageUploadSession\x12\x0f\n\x07session\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x04\x12\x0c\n\x04size\x18\x03 \x01(\x04\"E\n\x11ImageUploadCommit\x12\r\n\x05token\x18\x01 \x01(\t\x12\x0f\n\x07session\x18\x02 \x01(\t\x12\x10\n\x08\x66ilename\x18\x03 \x01(\t\"F\n\x10ImageBatchUpload\x12\r\n\x05token\x18\x01 \x01(\t\x12#\n\x06images\x18\x02 \x03(\x0b\x32\x13.events.ImageUpload\"4\n\x10ImageBatchDelete\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tfilenames\x18\x02 \x03(\t\":\n\x10ImageBatchResult\x12&\n\x07results\x18\x01 \x03(\x0b\x32\x15.events.StateResponse\"/\n\x0bImageExists\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tfilenames\x18\x02 \x03(\t\"#\n\x11ImageExistsResult\x12\x0e\n\x06\x65xists\x18\x01 \x03(\x08\"_\n\x0fImageCacheStats\x12\x0c\n\x04hits\x18\x01 \x01(\x04\x12\x0e\n\x06misses\x18\x02 \x01(\x04\x12\x11\n\tevictions\x18\x03 \x01(\x04\x12\x0c\n\x04size\x18\x04 \x01(\x04\x12\r\n\x05\x63ount\x18\x05 \x01(\r\"E\n\rImageGcReport\x12\x0f\n\x07orphans\x18\x01 \x03(\t\x12#\n\x08\x64\x61ngling\x18\x02 \x03(\x0b\x32\x11.events.EventSpec\".\n\x0bImageDelete\x12\r\n\x05token\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\" \n\rStateResponse\x12\x0f\n\x07message\x18\x01 \x01(\tb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,21 +34,59 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_EVENTSPEC']._serialized_start=28
   _globals['_EVENTSPEC']._serialized_end=161
   _globals['_EVENTLIST']._serialized_start=163
-  _globals['_EVENTLIST']._serialized_end=209
-  _globals['_EVENTPOST']._serialized_start=211
-  _globals['_EVENTPOST']._serialized_end=272
-  _globals['_EVENTDELETE']._serialized_start=274
-  _globals['_EVENTDELETE']._serialized_end=317
-  _globals['_EVENTUPDATE']._serialized_start=319
-  _globals['_EVENTUPDATE']._serialized_end=381
-  _globals['_ADMINTOKEN']._serialized_start=383
-  _globals['_ADMINTOKEN']._serialized_end=410
-  _globals['_STORAGEINFO']._serialized_start=412
-  _globals['_STORAGEINFO']._serialized_end=469
-  _globals['_IMAGEUPLOAD']._serialized_start=471
-  _globals['_IMAGEUPLOAD']._serialized_end=532
-  _globals['_IMAGEDELETE']._serialized_start=534
-  _globals['_IMAGEDELETE']._serialized_end=580
-  _globals['_STATERESPONSE']._serialized_start=582
-  _globals['_STATERESPONSE']._serialized_end=614
+  _globals['_EVENTLIST']._serialized_end=273
+  _globals['_IMAGEMETA']._serialized_start=275
+  _globals['_IMAGEMETA']._serialized_end=375
+  _globals['_IMAGEMETALIST']._serialized_start=377
+  _globals['_IMAGEMETALIST']._serialized_end=427
+  _globals['_EVENTPOST']._serialized_start=429
+  _globals['_EVENTPOST']._serialized_end=506
+  _globals['_EVENTDELETE']._serialized_start=508
+  _globals['_EVENTDELETE']._serialized_end=551
+  _globals['_EVENTUPDATE']._serialized_start=553
+  _globals['_EVENTUPDATE']._serialized_end=615
+  _globals['_EVENTOPERATION']._serialized_start=617
+  _globals['_EVENTOPERATION']._serialized_end=731
+  _globals['_EVENTBATCH']._serialized_start=733
+  _globals['_EVENTBATCH']._serialized_end=804
+  _globals['_EVENTBATCHRESULT']._serialized_start=806
+  _globals['_EVENTBATCHRESULT']._serialized_end=864
+  _globals['_EVENTCHANGE']._serialized_start=866
+  _globals['_EVENTCHANGE']._serialized_end=962
+  _globals['_EVENTCHANGES']._serialized_start=964
+  _globals['_EVENTCHANGES']._serialized_end=1043
+  _globals['_ADMINTOKEN']._serialized_start=1045
+  _globals['_ADMINTOKEN']._serialized_end=1072
+  _globals['_STORAGEQUERY']._serialized_start=1074
+  _globals['_STORAGEQUERY']._serialized_end=1150
+  _globals['_STORAGEFILE']._serialized_start=1152
+  _globals['_STORAGEFILE']._serialized_end=1226
+  _globals['_STORAGEINFO']._serialized_start=1229
+  _globals['_STORAGEINFO']._serialized_end=1358
+  _globals['_IMAGEUPLOAD']._serialized_start=1360
+  _globals['_IMAGEUPLOAD']._serialized_end=1421
+  _globals['_IMAGEUPLOADINIT']._serialized_start=1423
+  _globals['_IMAGEUPLOADINIT']._serialized_end=1469
+  _globals['_IMAGEUPLOADSESSION']._serialized_start=1471
+  _globals['_IMAGEUPLOADSESSION']._serialized_end=1538
+  _globals['_IMAGEUPLOADCOMMIT']._serialized_start=1540
+  _globals['_IMAGEUPLOADCOMMIT']._serialized_end=1609
+  _globals['_IMAGEBATCHUPLOAD']._serialized_start=1611
+  _globals['_IMAGEBATCHUPLOAD']._serialized_end=1681
+  _globals['_IMAGEBATCHDELETE']._serialized_start=1683
+  _globals['_IMAGEBATCHDELETE']._serialized_end=1735
+  _globals['_IMAGEBATCHRESULT']._serialized_start=1737
+  _globals['_IMAGEBATCHRESULT']._serialized_end=1795
+  _globals['_IMAGEEXISTS']._serialized_start=1797
+  _globals['_IMAGEEXISTS']._serialized_end=1844
+  _globals['_IMAGEEXISTSRESULT']._serialized_start=1846
+  _globals['_IMAGEEXISTSRESULT']._serialized_end=1881
+  _globals['_IMAGECACHESTATS']._serialized_start=1883
+  _globals['_IMAGECACHESTATS']._serialized_end=1978
+  _globals['_IMAGEGCREPORT']._serialized_start=1980
+  _globals['_IMAGEGCREPORT']._serialized_end=2049
+  _globals['_IMAGEDELETE']._serialized_start=2051
+  _globals['_IMAGEDELETE']._serialized_end=2097
+  _globals['_STATERESPONSE']._serialized_start=2099
+  _globals['_STATERESPONSE']._serialized_end=2131
 # @@protoc_insertion_point(module_scope)
@@ -0,0 +1,171 @@
+
+import time
+import asyncio
+import threading
+import pymysql
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, TypeVar
+from pymysql.connections import Connection
+from pymysql.constants import CLIENT, CR
+from app.config import (
+    MYSQL_HOST, MYSQL_PORT, MYSQL_AUTH,
+    MYSQL_POOL_MIN, MYSQL_POOL_MAX, MYSQL_POOL_PING
+)
+
+T = TypeVar("T")
+
+# 这些错误说明连接本身已经不可用，归还时直接丢弃
+BROKEN_ERRORS = (pymysql.err.InterfaceError, ConnectionError, OSError)
+# OperationalError 还包括死锁（1213）、锁等待超时（1205）等，连接本身完好，只看断线类错误码
+LOST_CONNECTION = {
+    CR.CR_CONN_HOST_ERROR, CR.CR_SERVER_GONE_ERROR,
+    CR.CR_SERVER_LOST, CR.CR_SERVER_LOST_EXTENDED
+}
+
+def is_broken(error: BaseException) -> bool:
+    if isinstance(error, pymysql.err.OperationalError):
+        return bool(error.args) and error.args[0] in LOST_CONNECTION
+    return isinstance(error, BROKEN_ERRORS)
+
+class ConnectionPool:
+
+    _min_size: int
+    _max_size: int
+    _ping_interval: float
+    _connect_kwargs: dict[str, Any]
+    _idle: deque[tuple[Connection, float]]
+    _lock: threading.Lock
+    _size: int
+    _slots: asyncio.Semaphore | None
+    _closed: bool
+
+    def __init__(
+        self, min_size: int = 1, max_size: int = 10,
+        ping_interval: float = 30.0, **connect_kwargs: Any
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("invalid pool size")
+        self._min_size = min_size
+        self._max_size = max_size
+        self._ping_interval = ping_interval
+        self._connect_kwargs = connect_kwargs
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._slots = None
+        self._closed = False
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_size)
+        return self._slots
+
+    def _connect(self) -> Connection:
+        conn = pymysql.connect(**self._connect_kwargs)
+        with self._lock:
+            self._size += 1
+        return conn
+
+    def _discard(self, conn: Connection) -> None:
+        with self._lock:
+            self._size -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _checkout(self) -> Connection:
+        while True:
+            with self._lock:
+                if not self._idle: break
+                conn, released_at = self._idle.pop()
+            if time.monotonic() - released_at < self._ping_interval:
+                return conn
+            try:
+                conn.ping(reconnect=True)
+                return conn
+            except Exception:
+                self._discard(conn)
+        return self._connect()
+
+    def _checkin(self, conn: Connection) -> None:
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return None
+        with self._lock:
+            if not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                return None
+        self._discard(conn)
+
+    def _fill(self) -> None:
+        while True:
+            with self._lock:
+                if self._size >= self._min_size: break
+            conn = self._connect()
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+
+    async def open(self) -> None:
+        self._closed = False
+        await asyncio.to_thread(self._fill)
+
+    async def acquire(self) -> Connection:
+        await self._semaphore().acquire()
+        try:
+            return await asyncio.to_thread(self._checkout)
+        except BaseException:
+            self._semaphore().release()
+            raise
+
+    async def release(self, conn: Connection, discard: bool = False) -> None:
+        try:
+            if discard:
+                await asyncio.to_thread(self._discard, conn)
+            else:
+                await asyncio.to_thread(self._checkin, conn)
+        finally:
+            self._semaphore().release()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Connection]:
+        conn = await self.acquire()
+        broken = False
+        try:
+            yield conn
+        except Exception as e:
+            broken = is_broken(e)
+            raise
+        finally:
+            await self.release(conn, discard=broken)
+
+    async def run(
+        self, func: Callable[..., T], *args: Any, retry: bool = False
+    ) -> T:
+        for attempt in range(2 if retry else 1):
+            try:
+                async with self.connection() as conn:
+                    return await asyncio.to_thread(func, conn, *args)
+            except Exception as e:
+                if not is_broken(e) or not retry or attempt: raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+mysql_user, mysql_pass = MYSQL_AUTH.split(':')
+
+pool = ConnectionPool(
+    MYSQL_POOL_MIN, MYSQL_POOL_MAX, MYSQL_POOL_PING,
+    host=MYSQL_HOST, user=mysql_user, password=mysql_pass,
+    port=MYSQL_PORT, database="kxpage",
+    # UPDATE 的 rowcount 按匹配行数计算，值未变化时也能判断事件是否存在
+    client_flag=CLIENT.FOUND_ROWS
+)
@@ -0,0 +1,215 @@
+
+from contextlib import contextmanager
+from typing import Callable, Iterator
+from pymysql.cursors import Cursor
+from pymysql.connections import Connection
+from app.config import SCHEMA_LOCK_TIMEOUT
+
+EVENTS_DDL = """CREATE TABLE IF NOT EXISTS events (
+    uuid VARCHAR(64) NOT NULL,
+    ev_time DATETIME NOT NULL,
+    ev_title VARCHAR(255) NOT NULL,
+    ev_href TEXT NULL,
+    image_hash VARCHAR(128) NULL,
+    ev_desc TEXT NOT NULL,
+    PRIMARY KEY (uuid),
+    INDEX idx_events_time (ev_time, uuid)
+) DEFAULT CHARSET = utf8mb4;
+"""
+
+CHANGES_DDL = """CREATE TABLE IF NOT EXISTS event_changes (
+    seq BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    uuid VARCHAR(64) NOT NULL,
+    deleted TINYINT(1) NOT NULL DEFAULT 0,
+    changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (seq),
+    INDEX idx_changes_uuid (uuid, seq)
+) DEFAULT CHARSET = utf8mb4;
+"""
+
+# event_changes 的序号计数器，写事务对其加锁取号，保证序号按提交顺序递增
+CHANGE_SEQ_DDL = """CREATE TABLE IF NOT EXISTS change_seq (
+    id TINYINT NOT NULL,
+    seq BIGINT UNSIGNED NOT NULL,
+    PRIMARY KEY (id)
+);
+"""
+
+IMAGES_DDL = """CREATE TABLE IF NOT EXISTS images (
+    name VARCHAR(128) NOT NULL,
+    size BIGINT UNSIGNED NOT NULL,
+    mtime DOUBLE NOT NULL,
+    PRIMARY KEY (name)
+) DEFAULT CHARSET = utf8mb4;
+"""
+
+# 单行汇总，随 images 同事务增减，storage_info 读总量不必扫表
+IMAGE_TOTALS_DDL = """CREATE TABLE IF NOT EXISTS image_totals (
+    id TINYINT NOT NULL,
+    count BIGINT UNSIGNED NOT NULL,
+    size BIGINT UNSIGNED NOT NULL,
+    PRIMARY KEY (id)
+);
+"""
+
+IMAGE_META_DDL = """CREATE TABLE IF NOT EXISTS image_meta (
+    name VARCHAR(128) NOT NULL,
+    width INT UNSIGNED NOT NULL,
+    height INT UNSIGNED NOT NULL,
+    format VARCHAR(16) NOT NULL,
+    size BIGINT UNSIGNED NOT NULL,
+    lqip VARBINARY(4096) NOT NULL,
+    PRIMARY KEY (name)
+) DEFAULT CHARSET = utf8mb4;
+"""
+
+VERSION_DDL = """CREATE TABLE IF NOT EXISTS schema_version (
+    id TINYINT NOT NULL,
+    version INT NOT NULL,
+    PRIMARY KEY (id)
+);
+"""
+
+# 查询与写入依赖的索引：(表, 索引名, 列)
+REQUIRED_INDEXES = (
+    ("events", "PRIMARY", ("uuid", )),
+    ("events", "idx_events_time", ("ev_time", "uuid")),
+    ("events", "ft_events_text", ("ev_title", "ev_desc")),
+    ("event_changes", "PRIMARY", ("seq", )),
+    ("event_changes", "idx_changes_uuid", ("uuid", "seq")),
+    ("events", "idx_events_image", ("image_hash", )),
+    ("images", "PRIMARY", ("name", )),
+    ("image_meta", "PRIMARY", ("name", )),
+)
+
+def index_columns(cursor: Cursor, table: str, index: str) -> tuple[str, ...]:
+    cursor.execute(
+"""SELECT COLUMN_NAME FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+ORDER BY SEQ_IN_INDEX;
+""", (table, index))
+    return tuple(row[0] for row in cursor.fetchall())
+
+def has_column(cursor: Cursor, table: str, column: str) -> bool:
+    cursor.execute(
+"""SELECT 1 FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s;
+""", (table, column))
+    return cursor.fetchone() is not None
+
+def _v1_events(cursor: Cursor) -> None:
+    # 旧部署里 events 表是手工建的，只补齐缺失的主键和时间索引
+    cursor.execute(EVENTS_DDL)
+    if not index_columns(cursor, "events", "PRIMARY"):
+        cursor.execute("ALTER TABLE events ADD PRIMARY KEY (uuid);")
+    if not index_columns(cursor, "events", "idx_events_time"):
+        cursor.execute("ALTER TABLE events ADD INDEX idx_events_time (ev_time, uuid);")
+
+def _v2_changes(cursor: Cursor) -> None:
+    cursor.execute(CHANGES_DDL)
+
+def _v3_fulltext(cursor: Cursor) -> None:
+    # ngram 解析器按 ngram_token_size（默认 2）切分，中文标题也能命中
+    if not index_columns(cursor, "events", "ft_events_text"):
+        cursor.execute(
+"""ALTER TABLE events
+ADD FULLTEXT INDEX ft_events_text (ev_title, ev_desc) WITH PARSER ngram;
+""")
+
+def _v4_images(cursor: Cursor) -> None:
+    # 只建表，不写 image_totals：由首次 reconcile 扫描图片库后写入
+    cursor.execute(IMAGES_DDL)
+    cursor.execute(IMAGE_TOTALS_DDL)
+
+def _v5_image_refs(cursor: Cursor) -> None:
+    # 图片回收按 image_hash 反查引用
+    if not index_columns(cursor, "events", "idx_events_image"):
+        cursor.execute("ALTER TABLE events ADD INDEX idx_events_image (image_hash);")
+
+def _v6_image_meta(cursor: Cursor) -> None:
+    cursor.execute(IMAGE_META_DDL)
+
+def _v7_image_original(cursor: Cursor) -> None:
+    # 入库优化前的原始大小；已有图片未经优化，原始大小即当前大小
+    # ALTER 会隐式提交，回填放在检查之外，中途失败重跑时仍能补齐
+    for table in ("images", "image_totals"):
+        if not has_column(cursor, table, "original"):
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN original BIGINT UNSIGNED NOT NULL DEFAULT 0;"
+            )
+        cursor.execute(f"UPDATE {table} SET original = size WHERE original = 0;")
+
+def _v8_change_seq(cursor: Cursor) -> None:
+    cursor.execute(CHANGE_SEQ_DDL)
+    cursor.execute(
+"""INSERT IGNORE INTO change_seq (id, seq)
+SELECT 1, COALESCE(MAX(seq), 0) FROM event_changes;
+""")
+
+MIGRATIONS: list[tuple[int, Callable[[Cursor], None]]] = [
+    (1, _v1_events),
+    (2, _v2_changes),
+    (3, _v3_fulltext),
+    (4, _v4_images),
+    (5, _v5_image_refs),
+    (6, _v6_image_meta),
+    (7, _v7_image_original),
+    (8, _v8_change_seq),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def current_version(cursor: Cursor) -> int:
+    cursor.execute(VERSION_DDL)
+    cursor.execute("SELECT version FROM schema_version WHERE id = 1;")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+@contextmanager
+def schema_lock(cursor: Cursor) -> Iterator[None]:
+    # 每个 worker 启动时都会迁移，先检查再 ALTER 的步骤必须串行执行；
+    # 命名锁随连接断开自动释放，持锁的 worker 崩溃不会卡住其它 worker
+    cursor.execute("SELECT GET_LOCK('kxpage_schema', %s);", (SCHEMA_LOCK_TIMEOUT, ))
+    if cursor.fetchone()[0] != 1:
+        raise RuntimeError("timed out waiting for schema lock")
+    try:
+        yield
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK('kxpage_schema');")
+
+def migrate(db: Connection) -> list[int]:
+    cursor = db.cursor()
+    applied = []
+    try:
+        with schema_lock(cursor):
+            # 版本号在拿到锁之后再读，先到的 worker 已完成的步骤不会重复执行
+            version = current_version(cursor)
+            for target, step in MIGRATIONS:
+                if target <= version: continue
+                step(cursor)
+                cursor.execute(
+                    "REPLACE INTO schema_version (id, version) VALUES (1, %s);",
+                    (target, )
+                )
+                db.commit()
+                applied.append(target)
+    finally:
+        cursor.close()
+    return applied
+
+def verify(db: Connection) -> None:
+    cursor = db.cursor()
+    try:
+        version = current_version(cursor)
+        if version < SCHEMA_VERSION:
+            raise RuntimeError(
+                f"schema version {version} is behind {SCHEMA_VERSION}, run migrations first"
+            )
+        for table, index, columns in REQUIRED_INDEXES:
+            found = index_columns(cursor, table, index)
+            if found != columns:
+                raise RuntimeError(
+                    f"index {table}.{index} expected {columns}, found {found or 'nothing'}"
+                )
+    finally:
+        cursor.close()
@@ -28,3 +28,19 @@ def parse_protobuf(
                 media_type="application/octet-stream"
             )
     return True, wrapped
+
+def bad_request() -> Response:
+    response: Message = Event_pb2.StateResponse()
+    response.message = "failed"
+    return Response(
+        response.SerializeToString(), 400,
+        media_type="application/octet-stream"
+    )
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match: return False
+    if if_none_match.strip() == "*": return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip().removeprefix("W/")
+        if candidate == etag: return True
+    return False
@@ -1,129 +1,375 @@
 
-import atexit
-import pymysql
 import asyncio
-from base64 import b64decode
+import pymysql
+from base64 import b64decode, urlsafe_b64encode
 from datetime import datetime
 from google.protobuf.message import Message
 from typing import Annotated
-from fastapi import APIRouter, Response, Body
-from app.v1 import parse_protobuf
+from fastapi import APIRouter, Response, Body, Header, Query
+from fastapi.responses import StreamingResponse
+from pymysql.connections import Connection
+from pymysql.cursors import Cursor, SSCursor
+from app.v1 import parse_protobuf, etag_matches, bad_request
 from app.pbf import Event_pb2
-from app.config import MYSQL_HOST, MYSQL_AUTH, MYSQL_PORT, ADMIN_HASH
-
-mysql_user, mysql_pass = MYSQL_AUTH.split(':')
-
-db = pymysql.connect(
-    host=MYSQL_HOST, user=mysql_user, password=mysql_pass,
-    port=MYSQL_PORT, database="kxpage"
+from app.pool import pool
+from app.v1.images.gc import lock_images
+from app.v1.images.catalog import fetch_metadata, fill_meta
+from app.config import (
+    EVENTS_CACHE_SIZE, EVENTS_CACHE_TTL, EVENTS_CACHE_CONTROL,
+    EVENTS_PAGE_SIZE, EVENTS_PAGE_MAX, EVENTS_EXPORT_BATCH, EVENTS_CHANGES_MAX
 )
+from .cache import ResponseCache
+from .changes import record_changes, head_seq, fetch_changes
+from .search import search_events
+
+event_cache = ResponseCache(EVENTS_CACHE_SIZE, EVENTS_CACHE_TTL)
 
 event_router = APIRouter(
     prefix="/api/events",
     tags=["events"]
 )
 
-@event_router.get("/")
-async def get_events(q: str = ""):
+def feed_response(data: bytes, etag: str, if_none_match: str | None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": EVENTS_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=data,
+        status_code=200,
+        headers=headers,
+        media_type="application/octet-stream"
+    )
 
-    def parse_query(q: str) -> str:
-        q += "=" * (len(q) - len(q) // 4)
-        bs = b64decode(q, altchars=b"-_")
-        return bs.decode("utf-8")
+def decode_query(q: str) -> str:
+    q += "=" * (len(q) - len(q) // 4)
+    bs = b64decode(q, altchars=b"-_")
+    return bs.decode("utf-8")
 
-    target = (
-        parse_query(q)
-        if q else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    )
+def encode_cursor(dtime: datetime, uuid: str) -> str:
+    raw = f"{dtime.strftime('%Y-%m-%d %H:%M:%S')}|{uuid}".encode("utf-8")
+    return urlsafe_b64encode(raw).decode("utf-8").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    dtime, uuid = decode_query(cursor).split('|', 1)
+    datetime.strptime(dtime, "%Y-%m-%d %H:%M:%S")
+    return dtime, uuid
+
+def fill_event(event: Message, record: tuple) -> None:
+    uuid, dtime, title, href, desc, img_hash = record
+    event.eventUUID = uuid
+    event.eventTitle = title
+    event.eventDescription = desc
+    if href: event.eventHref = href
+    event.eventTime = dtime.strftime("%Y/%m/%d")
+    if img_hash: event.imageHash = img_hash
+
+@event_router.get("/")
+async def get_events(
+    q: str = "",
+    limit: int = 0,
+    cursor: str = "",
+    meta: bool = False,
+    if_none_match: Annotated[str | None, Header()] = None
+):
+    # 不带 q 的首页请求窗口随时间滑动，统一用 None 作键，由 TTL 控制新鲜度
+    if limit < 0: return bad_request()
+    try:
+        target = decode_query(q).strip() if q else None
+    except Exception:
+        return bad_request()
+    paged = limit > 0 or bool(cursor)
+    limit = min(limit or EVENTS_PAGE_SIZE, EVENTS_PAGE_MAX)
+    key = (target, limit, cursor) if paged else target
+    # 附带图片元数据的响应与普通响应分开缓存
+    if meta: key = (key, "meta")
+    if (cached := event_cache.get(key)) is not None:
+        return feed_response(*cached, if_none_match)
+
+    if paged and cursor:
+        try:
+            after_time, after_uuid = decode_cursor(cursor)
+        except Exception:
+            return bad_request()
+    else:
+        after_time = target or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        after_uuid = None
+    generation = event_cache.generation
 
-    def execute():
+    def execute(db: Connection):
         cursor = db.cursor()
-        cursor.execute(
-f"""SELECT uuid, ev_time, ev_title, ev_href, ev_desc, image_hash
+        if not paged:
+            cursor.execute(
+"""SELECT uuid, ev_time, ev_title, ev_href, ev_desc, image_hash
 FROM events
-WHERE ev_time >= DATE_SUB('{target}', INTERVAL 6 MONTH)
-  AND ev_time < '{target}'
+WHERE ev_time >= DATE_SUB(%s, INTERVAL 6 MONTH)
+  AND ev_time < %s
 ORDER BY ev_time DESC;
-""")
-        db.commit()
+""", (after_time, after_time))
+        elif after_uuid is None:
+            cursor.execute(
+"""SELECT uuid, ev_time, ev_title, ev_href, ev_desc, image_hash
+FROM events
+WHERE ev_time < %s
+ORDER BY ev_time DESC, uuid DESC
+LIMIT %s;
+""", (after_time, limit + 1))
+        else:
+            cursor.execute(
+"""SELECT uuid, ev_time, ev_title, ev_href, ev_desc, image_hash
+FROM events
+WHERE ev_time < %s OR (ev_time = %s AND uuid < %s)
+ORDER BY ev_time DESC, uuid DESC
+LIMIT %s;
+""", (after_time, after_time, after_uuid, limit + 1))
         data = cursor.fetchall()
+        images = []
+        if meta:
+            page = data[:limit] if paged else data
+            images = fetch_metadata(cursor, [record[5] for record in page])
         cursor.close()
-        return data
+        return data, images
 
-    result = await asyncio.to_thread(execute)
+    result, images = await pool.run(execute, retry=True)
 
     ev_list: Message = Event_pb2.EventList()
+    if paged and len(result) > limit:
+        result = result[:limit]
+        uuid, dtime = result[-1][0], result[-1][1]
+        ev_list.cursor = encode_cursor(dtime, uuid)
     for record in result:
-        uuid, dtime, title, href, desc, img_hash = record
-        event = ev_list.events.add()
-        event.eventUUID = uuid
-        event.eventTitle = title
-        event.eventDescription = desc
-        if href: event.eventHref = href
-        event.eventTime = dtime.strftime("%Y/%m/%d")
-        if img_hash: event.imageHash = img_hash
+        fill_event(ev_list.events.add(), record)
+    for record in images:
+        # 格式为空表示无法解码
+        if record[3]: fill_meta(ev_list.images.add(), record)
 
     data = ev_list.SerializeToString()
+    etag = event_cache.put(key, data, generation)
+    return feed_response(data, etag, if_none_match)
 
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def encode_list_entry(record: tuple) -> bytes:
+    # EventList.events 是字段 1 的 repeated 消息，逐条拼接即为合法的 EventList
+    event: Message = Event_pb2.EventSpec()
+    fill_event(event, record)
+    body = event.SerializeToString()
+    return b"\x0a" + encode_varint(len(body)) + body
+
+@event_router.get("/export")
+async def export_events(
+    time_from: Annotated[str, Query(alias="from")] = "",
+    time_to: Annotated[str, Query(alias="to")] = ""
+):
+    conditions, params = [], []
+    try:
+        if time_from:
+            params.append(decode_query(time_from).strip())
+            conditions.append("ev_time >= %s")
+        if time_to:
+            params.append(decode_query(time_to).strip())
+            conditions.append("ev_time < %s")
+    except Exception:
+        return bad_request()
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    def open_cursor(db: Connection) -> tuple[SSCursor, int]:
+        # 先取变更序号再读快照，之后的变更由增量同步补上
+        plain = db.cursor()
+        seq = head_seq(plain)
+        plain.close()
+        cursor = db.cursor(SSCursor)
+        cursor.execute(
+f"""SELECT uuid, ev_time, ev_title, ev_href, ev_desc, image_hash
+FROM events
+{where}
+ORDER BY ev_time DESC, uuid DESC;
+""", params)
+        return cursor, seq
+
+    def read_chunk(cursor: SSCursor) -> bytes:
+        rows = cursor.fetchmany(EVENTS_EXPORT_BATCH)
+        if not rows:
+            cursor.close()
+            return b""
+        return b"".join(encode_list_entry(record) for record in rows)
+
+    async def stream():
+        # 连接在开始迭代时才取出，客户端提前断开时不会占住连接池
+        conn = await pool.acquire()
+        finished = False
+        try:
+            cursor, seq = await asyncio.to_thread(open_cursor, conn)
+            yield b"\x18" + encode_varint(seq)
+            while chunk := await asyncio.to_thread(read_chunk, cursor):
+                yield chunk
+            finished = True
+        finally:
+            # 未读完的流式结果集会卡住连接，直接丢弃
+            await pool.release(conn, discard=not finished)
+
+    return StreamingResponse(stream(), media_type="application/octet-stream")
+
+@event_router.get("/search")
+async def get_search(s: str, limit: int = 0, cursor: str = ""):
+    try:
+        text = decode_query(s).strip()
+        offset = int(cursor) if cursor else 0
+    except Exception:
+        return bad_request()
+    if not text or offset < 0 or limit < 0: return bad_request()
+    limit = min(limit or EVENTS_PAGE_SIZE, EVENTS_PAGE_MAX)
+
+    def execute(db: Connection) -> list[tuple]:
+        cursor = db.cursor()
+        rows = search_events(cursor, text, limit + 1, offset)
+        cursor.close()
+        return rows
+
+    result = await pool.run(execute, retry=True)
+
+    ev_list: Message = Event_pb2.EventList()
+    if len(result) > limit:
+        result = result[:limit]
+        ev_list.cursor = str(offset + limit)
+    for record in result:
+        fill_event(ev_list.events.add(), record)
     return Response(
-        content=data,
-        status_code=200,
-        media_type="application/octet-stream"
+        ev_list.SerializeToString(), 200, media_type="application/octet-stream"
+    )
+
+@event_router.get("/changes")
+async def get_changes(since: int | None = None, limit: int = 0):
+    if limit < 0: return bad_request()
+    limit = min(limit or EVENTS_CHANGES_MAX, EVENTS_CHANGES_MAX)
+
+    def execute(db: Connection) -> tuple[int, list[tuple]]:
+        cursor = db.cursor()
+        head = head_seq(cursor)
+        rows = fetch_changes(cursor, since, limit + 1) if since is not None else []
+        cursor.close()
+        return head, rows
+
+    head, rows = await pool.run(execute, retry=True)
+
+    result: Message = Event_pb2.EventChanges()
+    result.more = len(rows) > limit
+    rows = rows[:limit]
+    for seq, uuid, *record in rows:
+        change = result.changes.add()
+        change.seq = seq
+        change.eventUUID = uuid
+        if record[0] is None:
+            change.deleted = True
+        else:
+            fill_event(change.event, tuple(record))
+    if result.more:
+        result.seq = rows[-1][0]
+    else:
+        result.seq = max(head, rows[-1][0] if rows else 0)
+    return Response(
+        result.SerializeToString(), 200, media_type="application/octet-stream"
+    )
+
+INSERT_EVENT = """INSERT INTO events (uuid, ev_time, ev_title, ev_href, image_hash, ev_desc)
+VALUES (%s, %s, %s, %s, %s, %s)"""
+
+UPSERT_EVENT = INSERT_EVENT + """
+ON DUPLICATE KEY UPDATE
+    ev_time = VALUES(ev_time), ev_title = VALUES(ev_title),
+    ev_href = VALUES(ev_href), image_hash = VALUES(image_hash),
+    ev_desc = VALUES(ev_desc)"""
+
+def event_row(event: Message) -> tuple:
+    time = datetime.strptime(event.eventTime, "%Y/%m/%d")
+    return (
+        event.eventUUID, time, event.eventTitle,
+        event.eventHref or None, event.imageHash or None,
+        event.eventDescription
     )
 
 @event_router.post("/")
 async def post_events(data: Annotated[bytes, Body()]):
     valid, wrapped = parse_protobuf("EventPost", data, "token")
     if not valid: return wrapped
+    try:
+        rows = [event_row(event) for event in wrapped.events]
+    except ValueError:
+        return bad_request()
 
-    def executor():
+    def executor(db: Connection):
         cursor = db.cursor()
-        for event in wrapped.events:
-            uuid = event.eventUUID
-            title = event.eventTitle
-            desc = event.eventDescription
-            href = f"'{event.eventHref}'" if event.eventHref else "NULL"
-            time = datetime.strptime(event.eventTime, "%Y/%m/%d").strftime("%Y-%m-%d %H:%M:%S")
-            img_hash = f"'{event.imageHash}'" if event.imageHash else "NULL"
-
-            query = \
-    f"INSERT INTO events VALUES ('{uuid}', '{time}', '{title}', {href}, {img_hash}, '{desc}');"
-            cursor.execute(query)
-        db.commit()
-        cursor.close()
+        try:
+            lock_images(cursor, [row[4] for row in rows])
+            # executemany 会把多行合并成一条 INSERT ... VALUES 语句发送
+            cursor.executemany(UPSERT_EVENT if wrapped.upsert else INSERT_EVENT, rows)
+            record_changes(cursor, [row[0] for row in rows])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
 
-    await asyncio.to_thread(executor)
     message: Message = Event_pb2.StateResponse()
+    if rows:
+        try:
+            await pool.run(executor)
+        except pymysql.err.IntegrityError as e:
+            message.message = str(e)
+            return Response(
+                message.SerializeToString(), 409, media_type="application/octet-stream"
+            )
+        event_cache.invalidate()
     message.message = "success"
     return Response(
         message.SerializeToString(), 200, media_type="application/octet-stream"
     )
 
+def update_event_row(cursor: Cursor, event: Message) -> int:
+    changes, params = [], []
+    if m := event.eventTitle:
+        changes.append("ev_title = %s")
+        params.append(m)
+    if m := event.eventTime:
+        changes.append("ev_time = %s")
+        params.append(m)
+    changes.extend(("ev_href = %s", "ev_desc = %s", "image_hash = %s"))
+    params.extend((
+        event.eventHref or '', event.eventDescription or '', event.imageHash or ''
+    ))
+    cursor.execute(
+        f"UPDATE events SET {', '.join(changes)} WHERE uuid = %s;",
+        (*params, event.eventUUID)
+    )
+    return cursor.rowcount
+
+def delete_event_rows(cursor: Cursor, uuids: list[str]) -> int:
+    if not uuids: return 0
+    marks = ", ".join(["%s"] * len(uuids))
+    cursor.execute(f"DELETE FROM events WHERE uuid IN ({marks});", uuids)
+    return cursor.rowcount
+
 @event_router.put("/")
 async def put_event(data: Annotated[bytes, Body()]):
     valid, message = parse_protobuf("EventUpdate", data, "token")
     if not valid: return message
-    changes = []
-    uuid = message.event.eventUUID
-    if m := message.event.eventTitle: changes.append(f"ev_title='{m}'")
-    if m := message.event.eventTime: changes.append(f"ev_time='{m}'")
-    m = message.event.eventHref or ''
-    changes.append(f"ev_href='{m}'")
-    m = message.event.eventDescription or ''
-    changes.append(f"ev_desc='{m}'")
-    m = message.event.imageHash or ''
-    changes.append(f"image_hash='{m or ''}'")
-    set_clause = "SET " + ','.join(changes)
-    
-    def executor() -> None:
-        query = \
-f"""UPDATE events {set_clause} WHERE `uuid`='{uuid}';"""
+
+    def executor(db: Connection) -> None:
         cursor = db.cursor()
-        cursor.execute(query)
+        lock_images(cursor, [message.event.imageHash])
+        update_event_row(cursor, message.event)
+        record_changes(cursor, [message.event.eventUUID])
         db.commit()
         cursor.close()
 
-    await asyncio.to_thread(executor)
+    await pool.run(executor)
+    event_cache.invalidate()
     response: Message = Event_pb2.StateResponse()
     response.message = "success"
     return Response(
@@ -135,24 +381,67 @@ async def delete_events(data: Annotated[bytes, Body()]):
     valid, wrapped = parse_protobuf("EventDelete", data, "token")
     if not valid: return wrapped
 
-    collection = '(' + ",".join([f"'{uuid}'" for uuid in wrapped.uuids]) + ')'
-
-    def executor() -> None:
+    def executor(db: Connection) -> None:
         cursor = db.cursor()
-        query = f"DELETE FROM events WHERE uuid IN {collection};"
-        cursor.execute(query)
+        delete_event_rows(cursor, list(wrapped.uuids))
+        record_changes(cursor, list(wrapped.uuids), deleted=True)
         db.commit()
         cursor.close()
 
-    await asyncio.to_thread(executor)
+    await pool.run(executor)
+    event_cache.invalidate()
     message: Message = Event_pb2.StateResponse()
     message.message = "success"
     return Response(
         message.SerializeToString(), 200, media_type="application/octet-stream"
     )
 
+@event_router.post("/batch")
+async def batch_events(data: Annotated[bytes, Body()]):
+    valid, wrapped = parse_protobuf("EventBatch", data, "token")
+    if not valid: return wrapped
+
+    def apply(cursor: Cursor, operation: Message) -> str:
+        kind = operation.WhichOneof("op")
+        if kind == "create":
+            lock_images(cursor, [operation.create.imageHash])
+            cursor.execute(INSERT_EVENT + ";", event_row(operation.create))
+            record_changes(cursor, [operation.create.eventUUID])
+            return "success"
+        if kind == "update":
+            lock_images(cursor, [operation.update.imageHash])
+            if not update_event_row(cursor, operation.update): return "not found"
+            record_changes(cursor, [operation.update.eventUUID])
+            return "success"
+        if kind == "delete":
+            if not delete_event_rows(cursor, [operation.delete]): return "not found"
+            record_changes(cursor, [operation.delete], deleted=True)
+            return "success"
+        return "empty operation"
 
-def _end_of_life() -> None:
-    db.close()
+    def executor(db: Connection) -> tuple[bool, list[str]]:
+        cursor = db.cursor()
+        results: list[str] = []
+        try:
+            for operation in wrapped.operations:
+                results.append(apply(cursor, operation))
+            db.commit()
+            return True, results
+        except (ValueError, pymysql.err.MySQLError) as e:
+            # 任意一步出错则整批回滚，之前成功的操作一并作废
+            db.rollback()
+            results = ["rolled back"] * len(results) + [str(e)]
+            results += ["skipped"] * (len(wrapped.operations) - len(results))
+            return False, results
+        finally:
+            cursor.close()
 
-atexit.register(_end_of_life)
+    committed, results = await pool.run(executor)
+    if committed: event_cache.invalidate()
+    response: Message = Event_pb2.EventBatchResult()
+    for text in results:
+        response.results.add().message = text
+    return Response(
+        response.SerializeToString(), 200 if committed else 409,
+        media_type="application/octet-stream"
+    )
@@ -0,0 +1,49 @@
+
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Hashable
+
+def make_etag(data: bytes) -> str:
+    return '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+class ResponseCache:
+
+    _max_entries: int
+    _ttl: float
+    _entries: OrderedDict[Hashable, tuple[bytes, str, float]]
+    _generation: int
+
+    def __init__(self, max_entries: int = 64, ttl: float = 60.0):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> tuple[bytes, str] | None:
+        entry = self._entries.get(key)
+        if entry is None: return None
+        data, etag, expires = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return data, etag
+
+    def put(self, key: Hashable, data: bytes, generation: int) -> str:
+        etag = make_etag(data)
+        # 查询期间发生过写入，结果可能已经过期，不再缓存
+        if generation != self._generation: return etag
+        self._entries[key] = (data, etag, time.monotonic() + self._ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return etag
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entries.clear()
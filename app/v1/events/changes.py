@@ -0,0 +1,37 @@
+
+from pymysql.cursors import Cursor
+
+def record_changes(cursor: Cursor, uuids: list[str], deleted: bool = False) -> None:
+    # 自增序号在 INSERT 时分配而不是提交时，后分配的可能先提交，读者越过尚未提交的
+    # 较小序号后就再也看不到它；改从计数行取号并持有行锁到提交，序号顺序即提交顺序
+    if not uuids: return None
+    cursor.execute("SELECT seq FROM change_seq WHERE id = 1 FOR UPDATE;")
+    head = int(cursor.fetchone()[0])
+    cursor.executemany(
+        "INSERT INTO event_changes (seq, uuid, deleted) VALUES (%s, %s, %s);",
+        [(head + i, uuid, int(deleted)) for i, uuid in enumerate(uuids, 1)]
+    )
+    cursor.execute(
+        "UPDATE change_seq SET seq = %s WHERE id = 1;", (head + len(uuids), )
+    )
+
+def head_seq(cursor: Cursor) -> int:
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM event_changes;")
+    return int(cursor.fetchone()[0])
+
+def fetch_changes(cursor: Cursor, since: int, limit: int) -> list[tuple]:
+    # 同一事件的多次变更只保留最后一次，内容取 events 表的当前状态，查不到即为删除
+    cursor.execute(
+"""SELECT c.seq, c.uuid, e.uuid, e.ev_time, e.ev_title, e.ev_href, e.ev_desc, e.image_hash
+FROM (
+    SELECT uuid, MAX(seq) AS seq
+    FROM event_changes
+    WHERE seq > %s
+    GROUP BY uuid
+    ORDER BY seq
+    LIMIT %s
+) AS c
+LEFT JOIN events AS e ON e.uuid = c.uuid
+ORDER BY c.seq;
+""", (since, limit))
+    return cursor.fetchall()
@@ -0,0 +1,13 @@
+
+from pymysql.cursors import Cursor
+
+def search_events(cursor: Cursor, text: str, limit: int, offset: int) -> list[tuple]:
+    cursor.execute(
+"""SELECT uuid, ev_time, ev_title, ev_href, ev_desc, image_hash
+FROM events
+WHERE MATCH(ev_title, ev_desc) AGAINST (%s IN NATURAL LANGUAGE MODE)
+ORDER BY MATCH(ev_title, ev_desc) AGAINST (%s IN NATURAL LANGUAGE MODE) DESC,
+         ev_time DESC, uuid DESC
+LIMIT %s OFFSET %s;
+""", (text, text, limit, offset))
+    return cursor.fetchall()
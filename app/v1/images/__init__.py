@@ -1,51 +1,392 @@
 
 import os
-import aiofiles
+import time
+import asyncio
+import hashlib
+import logging
+from concurrent.futures.process import BrokenProcessPool
 from google.protobuf.message import Message
 from typing import Annotated
-from fastapi import APIRouter, Response, Body
-from app.v1 import parse_protobuf
-from app.config import IMAGE_STORE
+from fastapi import APIRouter, Request, Response, Body, Header, Query
+from fastapi.responses import FileResponse
+from pymysql.connections import Connection
+from app.v1 import parse_protobuf, etag_matches, bad_request
+from app.config import (
+    IMAGE_STORE, IMAGES_CACHE_CONTROL,
+    IMAGE_VARIANT_STORE, IMAGE_VARIANT_LIMIT, IMAGE_VARIANT_MAX, IMAGE_VARIANT_WORKERS,
+    IMAGE_TRANSCODE_FORMATS,
+    IMAGE_UPLOAD_STORE, IMAGE_UPLOAD_TTL, IMAGE_UPLOAD_MAX,
+    IMAGE_LIST_PAGE, IMAGE_LIST_MAX, IMAGE_BATCH_MAX,
+    IMAGE_LQIP_SIZE, IMAGE_META_WORKERS, IMAGE_META_ON_DEMAND,
+    IMAGE_OPTIMIZE_ENABLED, IMAGE_OPTIMIZE_PROGRESSIVE, IMAGE_OPTIMIZE_WORKERS,
+    IMAGE_OPTIMIZE_MAX,
+    IMAGE_MEMCACHE_LIMIT, IMAGE_MEMCACHE_OBJECT, IMAGE_MEMCACHE_ADMIT, IMAGE_MEMCACHE_SKETCH,
+    IMAGE_BLOOM_ENABLED, IMAGE_BLOOM_CAPACITY, IMAGE_BLOOM_ERROR, IMAGE_BLOOM_REFRESH,
+    IMAGE_GC_SWEEP, IMAGE_GC_GRACE, IMAGE_GC_INTERVAL, IMAGE_GC_BATCH, IMAGE_GC_PAUSE,
+    IMAGE_GC_REPORT_MAX,
+    IMAGE_PACK_ENABLED, IMAGE_PACK_STORE, IMAGE_PACK_SIZE, IMAGE_PACK_THRESHOLD,
+    IMAGE_PACK_COMPACT_RATIO, IMAGE_PACK_COMPACT_INTERVAL
+)
 from app.pbf import Event_pb2
+from app.pool import pool
+from app.schema import schema_lock
+from .variants import VariantCache, FITS, remove_files, transcode_targets
+from .uploads import UploadSessions
+from .store import FileStore, name_digest
+from .packs import PackStore, TieredStore
+from .manifest import manifest_add, manifest_totals, manifest_list, reconcile
+from .gc import release_image, find_orphans, find_dangling
+from .memcache import BytesCache, read_file
+from .bloom import PresenceFilter
+from .catalog import MetadataExtractor, store_metadata, fetch_metadata, fill_meta
+from .optimize import ImageOptimizer
+
 
+logger = logging.getLogger(__name__)
 
 image_router = APIRouter(
     prefix="/api/images", tags=["images"]
 )
 
-@image_router.get("/")
-async def image_get(h: str):
+variant_cache = VariantCache(
+    IMAGE_VARIANT_STORE, IMAGE_VARIANT_LIMIT, IMAGE_VARIANT_WORKERS
+)
+
+image_cache = BytesCache(
+    IMAGE_MEMCACHE_LIMIT, IMAGE_MEMCACHE_OBJECT,
+    IMAGE_MEMCACHE_ADMIT, IMAGE_MEMCACHE_SKETCH
+)
+
+known_images = PresenceFilter(IMAGE_BLOOM_CAPACITY, IMAGE_BLOOM_ERROR)
+
+metadata_extractor = MetadataExtractor(IMAGE_META_WORKERS, IMAGE_LQIP_SIZE)
+image_optimizer = ImageOptimizer(IMAGE_OPTIMIZE_WORKERS, IMAGE_OPTIMIZE_PROGRESSIVE)
+# 上传后在后台提取元数据，保留任务引用以免被提前回收
+catalog_tasks: set[asyncio.Task] = set()
+# 正在提取的文件名，后台任务与按需提取之间去重
+cataloging: set[str] = set()
+
+image_store: FileStore | TieredStore = FileStore(IMAGE_STORE)
+if IMAGE_PACK_ENABLED:
+    image_store = TieredStore(
+        image_store, PackStore(IMAGE_PACK_STORE, IMAGE_PACK_SIZE), IMAGE_PACK_THRESHOLD
+    )
+
+compact_task: asyncio.Task | None = None
+sweep_task: asyncio.Task | None = None
+bloom_task: asyncio.Task | None = None
+
+async def compact_packs(packs: PackStore) -> None:
+    while True:
+        await asyncio.sleep(IMAGE_PACK_COMPACT_INTERVAL)
+        try:
+            await asyncio.to_thread(packs.compact, IMAGE_PACK_COMPACT_RATIO)
+        except Exception:
+            # 压缩中断不影响读写，下一轮重新挑选候选包
+            logger.exception("pack compaction failed")
+
+upload_sessions = UploadSessions(IMAGE_UPLOAD_STORE, IMAGE_UPLOAD_TTL)
+
+async def release(name: str) -> bool:
+
+    def executor(db: Connection) -> bool:
+        cursor = db.cursor()
+        try:
+            released = release_image(cursor, name)
+            db.commit()
+            return released
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    # 先在清单里摘除再删文件，删除失败只会留下清单外的文件，由 reconcile 补回
+    if not await pool.run(executor): return False
+    await asyncio.to_thread(image_store.remove, name)
+    remove_files(variant_cache.discard(name))
+    image_cache.discard(image_etag(name)[:-1])
+    return True
+
+async def sweep_orphans() -> None:
+    while True:
+        await asyncio.sleep(IMAGE_GC_INTERVAL)
+
+        def execute(db: Connection) -> list[str]:
+            cursor = db.cursor()
+            orphans = find_orphans(cursor, time.time() - IMAGE_GC_GRACE, IMAGE_GC_BATCH)
+            cursor.close()
+            return orphans
+
+        try:
+            orphans = await pool.run(execute, retry=True)
+        except Exception:
+            logger.exception("image gc scan failed")
+            continue
+        for name in orphans:
+            try:
+                await release(name)
+            except FileNotFoundError:
+                pass
+            except Exception:
+                # 单个文件失败不影响其余，下一轮会再次找到它
+                logger.exception("image gc failed to release %s", name)
+            # 逐个删除并限速，不与正常请求争抢连接和磁盘
+            await asyncio.sleep(IMAGE_GC_PAUSE)
+
+async def rebuild_filter() -> None:
+    await asyncio.to_thread(known_images.rebuild, lambda: list(image_store.scan()))
+
+async def refresh_filter() -> None:
+    while True:
+        await asyncio.sleep(IMAGE_BLOOM_REFRESH)
+        try:
+            await rebuild_filter()
+        except Exception:
+            # 扫描失败时沿用旧过滤器，下一轮再试
+            logger.exception("image filter rebuild failed")
+
+async def images_startup() -> None:
+    global compact_task, sweep_task, bloom_task
+    await asyncio.to_thread(image_store.load)
+    await asyncio.to_thread(image_store.purge_temp)
+
+    def build_manifest(db: Connection) -> None:
+        # 汇总行不存在说明清单从未建立过，先完整扫描一次；与迁移共用命名锁，
+        # 多个 worker 同时首次启动时只有先拿到锁的那个扫描
+        cursor = db.cursor()
+        try:
+            with schema_lock(cursor):
+                if manifest_totals(cursor) is None: reconcile(db, image_store)
+        finally:
+            cursor.close()
+
+    await pool.run(build_manifest)
+    await variant_cache.load()
+    if isinstance(image_store, TieredStore):
+        compact_task = asyncio.create_task(compact_packs(image_store.packs))
+    if IMAGE_GC_SWEEP:
+        sweep_task = asyncio.create_task(sweep_orphans())
+    if IMAGE_BLOOM_ENABLED:
+        await rebuild_filter()
+        bloom_task = asyncio.create_task(refresh_filter())
+
+def images_shutdown() -> None:
+    if compact_task is not None: compact_task.cancel()
+    if sweep_task is not None: sweep_task.cancel()
+    if bloom_task is not None: bloom_task.cancel()
+    variant_cache.shutdown()
+    metadata_extractor.shutdown()
+    image_optimizer.shutdown()
+    for task in catalog_tasks:
+        task.cancel()
+
+def not_found() -> Response:
+    message: Message = Event_pb2.StateResponse()
+    message.message = "Image not found."
+    return Response(
+        message.SerializeToString(), 404,
+        media_type="application/octet-stream"
+    )
+
+def valid_name(name: str) -> bool:
+    # NUL 与超过文件系统上限的名字在 stat 时会抛 ValueError / ENAMETOOLONG，直接拒绝
+    return (
+        bool(name) and not name.startswith('.')
+        and os.path.basename(name) == name and '\\' not in name
+        and '\x00' not in name and len(os.fsencode(name)) <= 255
+    )
+
+def media_type(name: str) -> str:
+    _, ext = os.path.splitext(name)
+    return f"image/{ext.lstrip('.').lower()}"
+
+def image_etag(name: str) -> str:
+    stem, _ = os.path.splitext(name)
+    return f'"{stem}"'
+
+def accepted_types(accept: str | None) -> set[str]:
+    accepted = set()
+    for part in (accept or "").split(','):
+        media, *params = [item.strip() for item in part.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media and quality > 0: accepted.add(media.lower())
+    return accepted
+
+def negotiate_format(accept: str | None, targets: tuple[str, ...]) -> str:
+    if not targets: return ""
+    # 浏览器一般不会显式列出 image/*，只认具体类型，避免给 */* 的爬虫发新格式
+    accepted = accepted_types(accept)
+    for fmt in targets:
+        if f"image/{fmt}" in accepted: return fmt
+    return ""
+
+def byte_range(range_header: str, size: int) -> tuple[int, int] | None:
+    # 只支持单个区间，返回 [start, stop)；多区间或格式不对时返回 None，按完整内容应答
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != "bytes" or ',' in spec: return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep: return None
     try:
-        async with aiofiles.open(os.path.join(IMAGE_STORE, h), "rb") as rd:
-            img = await rd.read()
-    except Exception as e:
-        message: Message = Event_pb2.StateResponse()
-        message.message = "Image not found."
-        return Response(
-            message.SerializeToString(), 404,
-            media_type="application/octet-stream"
+        if not first: return max(size - int(last), 0), size
+        start = int(first)
+        stop = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    # 末端小于起点的区间语法无效，忽略；起点越界的交给调用方返回 416
+    if last and stop <= start: return None
+    return start, min(stop, size)
+
+def view_response(
+    data: memoryview, media: str, headers: dict[str, str],
+    range_header: str | None, if_range: str | None
+) -> Response:
+    # 与 FileResponse 一致地处理 Range / If-Range，响应体是映射内存的切片，不复制
+    size = len(data)
+    headers["Accept-Ranges"] = "bytes"
+    span = byte_range(range_header, size) if range_header is not None else None
+    if span is None or (if_range is not None and if_range != headers["ETag"]):
+        return Response(data, media_type=media, headers=headers)
+    start, stop = span
+    if start >= size:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+    headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    return Response(data[start:stop], 206, media_type=media, headers=headers)
+
+async def image_head(
+    h: str, fmt: str, resized: bool, headers: dict[str, str]
+) -> Response:
+    # HEAD 只查原图是否存在，不渲染变体、不转码，也不计入内存缓存的准入次数；
+    # 变体与转码结果的长度要生成后才知道，不给出 Content-Length
+    try:
+        item = await asyncio.to_thread(image_store.get, h)
+    except (OSError, ValueError):
+        return not_found()
+    if not (resized or fmt):
+        headers["Content-Length"] = str(item.size)
+        headers["Accept-Ranges"] = "bytes"
+    response = Response(
+        status_code=200, headers=headers,
+        media_type=f"image/{fmt}" if fmt else media_type(h)
+    )
+    if "Content-Length" not in headers: del response.headers["content-length"]
+    return response
+
+@image_router.api_route("/", methods=["GET", "HEAD"])
+async def image_get(
+    request: Request,
+    h: str,
+    width: int = 0,
+    height: int = 0,
+    fit: str = "contain",
+    accept: Annotated[str | None, Header()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+    range_header: Annotated[str | None, Header(alias="Range")] = None,
+    if_range: Annotated[str | None, Header()] = None
+):
+    # 布隆过滤器判定不存在即可直接返回，不访问磁盘
+    if not valid_name(h) or not known_images.might_contain(h): return not_found()
+    resized = bool(width or height)
+    if resized and (
+        fit not in FITS
+        or not 0 <= width <= IMAGE_VARIANT_MAX
+        or not 0 <= height <= IMAGE_VARIANT_MAX
+    ):
+        return bad_request()
+    targets = transcode_targets(h, IMAGE_TRANSCODE_FORMATS)
+    fmt = negotiate_format(accept, targets)
+    # 文件名即内容哈希，内容永不改变，校验器可直接由文件名、尺寸与格式得出
+    plain = image_etag(h)[:-1]
+    if resized: plain += f"-{width}x{height}-{fit}"
+    etag = f'{plain}-{fmt}"' if fmt else plain + '"'
+    headers = {"ETag": etag, "Cache-Control": IMAGES_CACHE_CONTROL}
+    if targets: headers["Vary"] = "Accept"
+    # 转码结果不比原图小时会退回原图，此时客户端持有的是原格式的 ETag
+    if etag_matches(if_none_match, etag) or (
+        fmt and etag_matches(if_none_match, plain + '"')
+    ):
+        return Response(status_code=304, headers=headers)
+    if request.method == "HEAD":
+        return await image_head(h, fmt, resized, headers)
+    # 范围请求交给 FileResponse 处理，不走内存缓存
+    if range_header is None and (cached := image_cache.get(etag)) is not None:
+        data, media, headers["ETag"] = cached
+        return Response(data, media_type=media, headers=headers)
+    try:
+        item = await asyncio.to_thread(image_store.get, h)
+    except (OSError, ValueError):
+        return not_found()
+    variant, cacheable = None, True
+    if resized or fmt:
+        source = item.path or bytes(item.data)
+        try:
+            variant = await variant_cache.get(source, h, width, height, fit, fmt)
+            stat = await asyncio.to_thread(os.stat, variant)
+        except Exception:
+            # 缩放或转码失败（文件截断、不支持的模式、解压炸弹、进程池损坏等）
+            # 不应影响原图本身，退回原图；不进内存缓存并要求重新验证，以免一次偶发失败被长期缓存
+            logger.exception("image render failed for %s", h)
+            if item.path is not None and not await asyncio.to_thread(
+                os.path.exists, item.path
+            ):
+                return not_found()
+            variant, cacheable = None, False
+            headers["ETag"] = plain + '"'
+            headers["Cache-Control"] = "no-cache"
+        else:
+            if not resized and stat.st_size >= item.size:
+                variant = None
+                headers["ETag"] = plain + '"'
+    if variant is not None:
+        path = variant
+    elif item.data is not None:
+        # 打包存储的图片直接以映射内存的视图作为响应体，不复制
+        return view_response(
+            item.data, media_type(h), headers, range_header, if_range
         )
-    _, ext = h.split('.')
-    return Response(
-        content=img,
-        status_code=200,
-        media_type=f"image/{ext}"
+    else:
+        path, stat = item.path, item.stat
+    if cacheable and range_header is None and image_cache.admit(etag, stat.st_size):
+        try:
+            data = await asyncio.to_thread(read_file, path)
+        except OSError:
+            return not_found()
+        view = image_cache.put(etag, data, media_type(path), headers["ETag"])
+        return Response(view, media_type=media_type(path), headers=headers)
+    # FileResponse 分块读取（可用时走 sendfile），并处理 Range / If-Range；HEAD 只发送头部
+    return FileResponse(
+        path, media_type=media_type(path), stat_result=stat, headers=headers
     )
 
 @image_router.delete("/")
 async def image_remove(data: Annotated[bytes, Body()]):
     valid, wrapped = parse_protobuf("ImageDelete", data, "token")
     if not valid: return wrapped
-    target = os.path.join(IMAGE_STORE, wrapped.filename)
+    # 文件名直接拼进存储路径，带路径分隔符的会删到图片库之外
+    if not valid_name(wrapped.filename): return bad_request()
     response: Message = Event_pb2.StateResponse()
     try:
-        os.remove(target)
+        released = await release(wrapped.filename)
     except Exception as e:
         response.message = str(e)
         return Response(
             response.SerializeToString(), 500,
             media_type="application/octet-stream"
         )
+    if not released:
+        response.message = "image is still referenced by events"
+        return Response(
+            response.SerializeToString(), 409,
+            media_type="application/octet-stream"
+        )
     response.message = "success"
     return Response(
         response.SerializeToString(), 200,
@@ -57,11 +398,12 @@ async def image_upload(data: Annotated[bytes, Body()]):
     valid, wrapped = parse_protobuf("ImageUpload", data, "token")
     if not valid: return wrapped
     given_file = wrapped.filename
-    image_data = wrapped.image
-    filepath = os.path.join(IMAGE_STORE, given_file)
-    if not os.path.exists(filepath):
-        async with aiofiles.open(filepath, "wb") as wt:
-            await wt.write(image_data)
+    if not valid_name(given_file): return bad_request()
+    # 已存在即内容相同，不再写盘；否则在线程中校验哈希、写临时文件后原子 rename
+    if not await asyncio.to_thread(image_store.exists, given_file):
+        if (original := await ingest(wrapped.image, given_file)) is None:
+            return bad_request()
+        await record_images([given_file], [original])
     message: Message = Event_pb2.StateResponse()
     message.message = given_file
     return Response(
@@ -69,21 +411,343 @@ async def image_upload(data: Annotated[bytes, Body()]):
         media_type="application/octet-stream"
     )
 
+async def ingest(data: bytes, name: str) -> int | None:
+    # 校验并写入上传内容，开启时先在进程池中优化；返回原始大小，校验失败返回 None
+    if not IMAGE_OPTIMIZE_ENABLED or len(data) > IMAGE_OPTIMIZE_MAX:
+        if not await asyncio.to_thread(image_store.write, data, name): return None
+        return len(data)
+    digest = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+    if digest != name_digest(name): return None
+    optimized = await image_optimizer.optimize(data)
+    await asyncio.to_thread(image_store.write, optimized, name, True)
+    return len(data)
+
+async def record_images(names: list[str], originals: list[int] | None = None) -> None:
+    for name in names:
+        known_images.add(name)
+    items = await asyncio.to_thread(lambda: [image_store.get(name) for name in names])
+    if originals is None: originals = [item.size for item in items]
+
+    def executor(db: Connection) -> None:
+        cursor = db.cursor()
+        for name, item, original in zip(names, items, originals):
+            manifest_add(cursor, name, item.size, item.mtime, original)
+        db.commit()
+        cursor.close()
+
+    await pool.run(executor)
+    schedule_catalog(names)
+
+def schedule_catalog(names: list[str]) -> None:
+    task = asyncio.create_task(catalog_images(names))
+    catalog_tasks.add(task)
+    task.add_done_callback(catalog_tasks.discard)
+
+async def catalog_images(names: list[str]) -> list[tuple]:
+    # 逐个提取并写入 image_meta，返回写入的记录；已有任务在提取的跳过。
+    # 无法解码的文件（非图片或已损坏）记为格式为空的行，之后不再反复解码
+    names = [name for name in names if name not in cataloging]
+    cataloging.update(names)
+    records = []
+    try:
+        for name in names:
+            try:
+                item = await asyncio.to_thread(image_store.get, name)
+            except (OSError, ValueError):
+                continue
+            source = item.path if item.path is not None else bytes(item.data)
+            try:
+                meta = await metadata_extractor.extract(source)
+            except BrokenProcessPool:
+                continue
+            except Exception:
+                meta = (0, 0, "", b"")
+            records.append((name, *meta[:3], item.size, meta[3]))
+
+        def executor(db: Connection) -> None:
+            cursor = db.cursor()
+            for name, width, height, fmt, size, lqip in records:
+                store_metadata(cursor, name, size, (width, height, fmt, lqip))
+            db.commit()
+            cursor.close()
+
+        if records: await pool.run(executor)
+    finally:
+        cataloging.difference_update(names)
+    return records
+
+@image_router.get("/meta")
+async def image_meta(h: Annotated[list[str], Query()]):
+    if len(h) > IMAGE_BATCH_MAX: return bad_request()
+    names = list(dict.fromkeys(name for name in h if valid_name(name)))
+
+    def execute(db: Connection) -> list[tuple]:
+        cursor = db.cursor()
+        rows = fetch_metadata(cursor, names)
+        cursor.close()
+        return rows
+
+    rows = await pool.run(execute, retry=True)
+    found = {row[0] for row in rows}
+    # 早于元数据目录上传、或后台提取尚未完成的图片：每次请求只当场提取少量，
+    # 其余交给后台，本次先返回已有的
+    missing = await asyncio.to_thread(
+        lambda: [
+            name for name in names
+            if name not in found and name not in cataloging
+            and known_images.might_contain(name) and image_store.exists(name)
+        ]
+    )
+    if later := missing[IMAGE_META_ON_DEMAND:]: schedule_catalog(later)
+    if now := missing[:IMAGE_META_ON_DEMAND]:
+        rows = [*rows, *await catalog_images(now)]
+    result: Message = Event_pb2.ImageMetaList()
+    for row in rows:
+        # 格式为空表示无法解码，不返回
+        if row[3]: fill_meta(result.images.add(), row)
+    headers = {}
+    if len(rows) == len(names): headers["Cache-Control"] = IMAGES_CACHE_CONTROL
+    return Response(
+        result.SerializeToString(), 200, headers=headers,
+        media_type="application/octet-stream"
+    )
+
+def batch_response(results: list[str]) -> Response:
+    response: Message = Event_pb2.ImageBatchResult()
+    for text in results:
+        response.results.add().message = text
+    return Response(
+        response.SerializeToString(), 200,
+        media_type="application/octet-stream"
+    )
+
+@image_router.post("/batch")
+async def image_batch_upload(data: Annotated[bytes, Body()]):
+    valid, wrapped = parse_protobuf("ImageBatchUpload", data, "token")
+    if not valid: return wrapped
+    if len(wrapped.images) > IMAGE_BATCH_MAX: return bad_request()
+
+    # 与单张上传相同：成功返回文件名，已存在的不再写盘；待写入的并发入库，
+    # 开启优化时可同时占满进程池
+    def check_all() -> list[bool | None]:
+        return [
+            image_store.exists(image.filename) if valid_name(image.filename) else None
+            for image in wrapped.images
+        ]
+
+    checked = await asyncio.to_thread(check_all)
+    pending = {}
+    for image, exists in zip(wrapped.images, checked):
+        if exists is False: pending.setdefault(image.filename, image.image)
+    # 单个文件出错只让该项失败，其余已写入的照常记入清单
+    outcomes = await asyncio.gather(
+        *(ingest(content, name) for name, content in pending.items()),
+        return_exceptions=True
+    )
+    originals = {
+        name: None if isinstance(outcome, BaseException) else outcome
+        for name, outcome in zip(pending, outcomes)
+    }
+    results, stored = [], []
+    for image, exists in zip(wrapped.images, checked):
+        name = image.filename
+        if exists is None or (not exists and originals[name] is None):
+            results.append("failed")
+            continue
+        results.append(name)
+        if not exists and name not in stored: stored.append(name)
+    if stored: await record_images(stored, [originals[name] for name in stored])
+    return batch_response(results)
+
+@image_router.post("/batch/delete")
+async def image_batch_remove(data: Annotated[bytes, Body()]):
+    valid, wrapped = parse_protobuf("ImageBatchDelete", data, "token")
+    if not valid: return wrapped
+    if len(wrapped.filenames) > IMAGE_BATCH_MAX: return bad_request()
+    results = []
+    for name in wrapped.filenames:
+        if not valid_name(name):
+            results.append("failed")
+            continue
+        try:
+            released = await release(name)
+        except FileNotFoundError:
+            results.append("Image not found.")
+            continue
+        except Exception as e:
+            results.append(str(e))
+            continue
+        results.append("success" if released else "image is still referenced by events")
+    return batch_response(results)
+
+@image_router.post("/exists")
+async def image_exists(data: Annotated[bytes, Body()]):
+    valid, wrapped = parse_protobuf("ImageExists", data, "token")
+    if not valid: return wrapped
+    if len(wrapped.filenames) > IMAGE_BATCH_MAX: return bad_request()
+    names = list(wrapped.filenames)
+    found = await asyncio.to_thread(
+        lambda: [
+            valid_name(name) and known_images.might_contain(name)
+            and image_store.exists(name)
+            for name in names
+        ]
+    )
+    result: Message = Event_pb2.ImageExistsResult()
+    result.exists.extend(found)
+    return Response(
+        result.SerializeToString(), 200,
+        media_type="application/octet-stream"
+    )
+
+def session_response(
+    session: str, offset: int, size: int, status_code: int = 200
+) -> Response:
+    message: Message = Event_pb2.ImageUploadSession()
+    message.session = session
+    message.offset = offset
+    message.size = size
+    return Response(
+        message.SerializeToString(), status_code,
+        media_type="application/octet-stream"
+    )
+
+@image_router.post("/upload")
+async def upload_init(data: Annotated[bytes, Body()]):
+    valid, wrapped = parse_protobuf("ImageUploadInit", data, "token")
+    if not valid: return wrapped
+    if not 0 < wrapped.size <= IMAGE_UPLOAD_MAX: return bad_request()
+    session = await asyncio.to_thread(upload_sessions.create, wrapped.size)
+    return session_response(session, 0, wrapped.size)
+
+# 会话号本身是 128 位随机串，由管理员 token 换取，分块请求不再重复校验 token，
+# 以便直接以原始字节流作为请求体，不经 protobuf 包装和整体缓冲
+
+@image_router.get("/upload")
+async def upload_state(session: str):
+    if not upload_sessions.valid_session(session): return not_found()
+    state = await asyncio.to_thread(upload_sessions.state, session)
+    if state is None: return not_found()
+    return session_response(session, *state)
+
+@image_router.put("/upload")
+async def upload_chunk(request: Request, session: str, offset: int):
+    if not upload_sessions.valid_session(session): return not_found()
+    async with upload_sessions.lock(session):
+        state = await asyncio.to_thread(upload_sessions.state, session)
+        if state is None: return not_found()
+        received, size = state
+        # 只接受紧接在已收到数据之后的分块，否则返回当前进度让客户端对齐
+        if offset != received:
+            return session_response(session, received, size, 409)
+        try:
+            received = await upload_sessions.write(
+                session, offset, size, request.stream()
+            )
+        except ValueError:
+            return bad_request()
+    return session_response(session, received, size)
+
+@image_router.post("/upload/commit")
+async def upload_commit(data: Annotated[bytes, Body()]):
+    valid, wrapped = parse_protobuf("ImageUploadCommit", data, "token")
+    if not valid: return wrapped
+    if not (
+        upload_sessions.valid_session(wrapped.session)
+        and valid_name(wrapped.filename)
+    ):
+        return bad_request()
+    async with upload_sessions.lock(wrapped.session):
+        state = await asyncio.to_thread(upload_sessions.state, wrapped.session)
+        if state is None: return not_found()
+        received, size = state
+        if received != size:
+            return session_response(wrapped.session, received, size, 409)
+        if not IMAGE_OPTIMIZE_ENABLED or size > IMAGE_OPTIMIZE_MAX:
+            if not await asyncio.to_thread(
+                upload_sessions.finish, wrapped.session, image_store, wrapped.filename
+            ):
+                return bad_request()
+        elif not await asyncio.to_thread(image_store.exists, wrapped.filename):
+            # 需要优化时整体读入内存走与单张上传相同的入库流程
+            content = await asyncio.to_thread(upload_sessions.read, wrapped.session)
+            upload_sessions.discard(wrapped.session)
+            if await ingest(content, wrapped.filename) is None: return bad_request()
+        else:
+            upload_sessions.discard(wrapped.session)
+    await record_images([wrapped.filename], [size])
+    message: Message = Event_pb2.StateResponse()
+    message.message = wrapped.filename
+    return Response(
+        message.SerializeToString(), 200,
+        media_type="application/octet-stream"
+    )
+
+@image_router.post("/cache")
+async def cache_stats(data: Annotated[bytes, Body()]):
+    valid, wrapped = parse_protobuf("AdminToken", data, "token")
+    if not valid: return wrapped
+    result: Message = Event_pb2.ImageCacheStats()
+    result.hits = image_cache.hits
+    result.misses = image_cache.misses
+    result.evictions = image_cache.evictions
+    result.size = image_cache.size
+    result.count = image_cache.count
+    return Response(
+        result.SerializeToString(), 200,
+        media_type="application/octet-stream"
+    )
+
+@image_router.post("/gc")
+async def gc_report(data: Annotated[bytes, Body()]):
+    valid, wrapped = parse_protobuf("AdminToken", data, "token")
+    if not valid: return wrapped
+
+    def execute(db: Connection) -> tuple[list[str], list[tuple[str, str]]]:
+        cursor = db.cursor()
+        orphans = find_orphans(cursor, time.time(), IMAGE_GC_REPORT_MAX)
+        dangling = find_dangling(cursor, IMAGE_GC_REPORT_MAX)
+        cursor.close()
+        return orphans, dangling
+
+    orphans, dangling = await pool.run(execute, retry=True)
+    result: Message = Event_pb2.ImageGcReport()
+    result.orphans.extend(orphans)
+    for uuid, image_hash in dangling:
+        event = result.dangling.add()
+        event.eventUUID = uuid
+        event.imageHash = image_hash
+    return Response(
+        result.SerializeToString(), 200,
+        media_type="application/octet-stream"
+    )
+
 @image_router.post("/info")
 async def storage_info(data: Annotated[bytes, Body()]):
-    valid, wrapped = parse_protobuf("AdminToken", data, "token")
+    valid, wrapped = parse_protobuf("StorageQuery", data, "token")
     if not valid: return wrapped
+    limit = min(wrapped.limit or IMAGE_LIST_PAGE, IMAGE_LIST_MAX)
 
-    filenames = os.listdir(IMAGE_STORE)
-    filecount = len(filenames)
-    filepath = [os.path.join(IMAGE_STORE, file) for file in filenames]
-    total_size = sum([os.path.getsize(file) for file in filepath])
+    def execute(db: Connection) -> tuple[tuple[int, int, int] | None, list[tuple]]:
+        cursor = db.cursor()
+        totals = manifest_totals(cursor)
+        rows = manifest_list(cursor, wrapped.prefix, wrapped.cursor, limit + 1)
+        cursor.close()
+        return totals, rows
 
+    totals, rows = await pool.run(execute, retry=True)
     result: Message = Event_pb2.StorageInfo()
-    result.size = total_size
-    result.count = filecount
-    for file in filenames:
-        result.files.append(file)
+    result.count, result.size, result.original = totals or (0, 0, 0)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        result.cursor = rows[-1][0]
+    for name, size, mtime, original in rows:
+        result.files.append(name)
+        entry = result.entries.add()
+        entry.name = name
+        entry.size = size
+        entry.mtime = mtime
+        entry.original = original
     return Response(
         result.SerializeToString(),
         status_code=200,
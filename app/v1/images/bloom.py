@@ -0,0 +1,76 @@
+
+import math
+import hashlib
+import threading
+from typing import Callable, Iterable
+
+class BloomFilter:
+
+    _bits: bytearray
+    _size: int
+    _hashes: int
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self._size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def _positions(self, name: str) -> Iterable[int]:
+        # 双重哈希：由一次 blake2b 的两半派生出 k 个位置
+        digest = hashlib.blake2b(name.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self._size for i in range(self._hashes))
+
+    def add(self, name: str) -> None:
+        for pos in self._positions(name):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, name: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(name)
+        )
+
+class PresenceFilter:
+
+    _capacity: int
+    _error_rate: float
+    _filter: BloomFilter | None
+    # 重建期间新增的名字，重建完成时补进新过滤器
+    _building: list[str] | None
+    _lock: threading.Lock
+
+    def __init__(self, capacity: int, error_rate: float):
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._filter = None
+        self._building = None
+        self._lock = threading.Lock()
+
+    def might_contain(self, name: str) -> bool:
+        # 尚未建好时不能下结论
+        return self._filter is None or name in self._filter
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            if self._filter is not None: self._filter.add(name)
+            if self._building is not None: self._building.append(name)
+
+    def rebuild(self, scan: Callable[[], list[str]]) -> None:
+        # 扫描开始前就收集新增的名字，扫描期间上传的图片不会在切换后丢失
+        with self._lock:
+            self._building = []
+        try:
+            names = scan()
+            # 删除无法从布隆过滤器中撤销，定期重建时顺带清掉；容量留出一倍余量
+            fresh = BloomFilter(max(self._capacity, len(names) * 2), self._error_rate)
+            for name in names:
+                fresh.add(name)
+            with self._lock:
+                for name in self._building:
+                    fresh.add(name)
+                self._filter = fresh
+        finally:
+            with self._lock:
+                self._building = None
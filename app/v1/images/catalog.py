@@ -0,0 +1,73 @@
+
+import io
+from google.protobuf.message import Message
+from pymysql.cursors import Cursor
+from PIL import Image, ImageOps
+from .workers import WorkerPool
+from .variants import normalize_mode
+
+def extract_metadata(source: str | bytes, lqip_size: int) -> tuple[int, int, str, bytes]:
+    if isinstance(source, bytes): source = io.BytesIO(source)
+    with Image.open(source) as image:
+        fmt = image.format or ""
+        # 宽高按 EXIF 方向校正后的显示尺寸给出，前端据此预留版面
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        # 占位图生成失败（如不支持的像素模式）时仍记下宽高与格式，只是没有占位图
+        try:
+            image = normalize_mode(image)
+            if image.mode not in ("RGB", "RGBA", "L"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            image.thumbnail((lqip_size, lqip_size), Image.Resampling.BILINEAR)
+            buffer = io.BytesIO()
+            image.save(buffer, format="WEBP", quality=30)
+            lqip = buffer.getvalue()
+        except Exception:
+            lqip = b""
+    return width, height, fmt.lower(), lqip
+
+class MetadataExtractor:
+
+    _lqip_size: int
+    _pool: WorkerPool
+
+    def __init__(self, workers: int, lqip_size: int):
+        self._lqip_size = lqip_size
+        self._pool = WorkerPool(workers)
+
+    async def extract(self, source: str | bytes) -> tuple[int, int, str, bytes]:
+        return await self._pool.run(extract_metadata, source, self._lqip_size)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown()
+
+def store_metadata(
+    cursor: Cursor, name: str, size: int, meta: tuple[int, int, str, bytes]
+) -> None:
+    width, height, fmt, lqip = meta
+    cursor.execute(
+"""REPLACE INTO image_meta (name, width, height, format, size, lqip)
+VALUES (%s, %s, %s, %s, %s, %s);
+""", (name, width, height, fmt, size, lqip))
+
+def remove_metadata(cursor: Cursor, name: str) -> None:
+    cursor.execute("DELETE FROM image_meta WHERE name = %s;", (name, ))
+
+def fetch_metadata(cursor: Cursor, names: list[str]) -> list[tuple]:
+    names = list(dict.fromkeys(name for name in names if name))
+    if not names: return []
+    marks = ", ".join(["%s"] * len(names))
+    cursor.execute(
+        f"""SELECT name, width, height, format, size, lqip FROM image_meta
+WHERE name IN ({marks});
+""", names)
+    return cursor.fetchall()
+
+def fill_meta(message: Message, record: tuple) -> None:
+    name, width, height, fmt, size, lqip = record
+    message.name = name
+    message.width = width
+    message.height = height
+    message.format = fmt
+    message.size = size
+    message.lqip = bytes(lqip)
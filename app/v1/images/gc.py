@@ -0,0 +1,40 @@
+
+from pymysql.cursors import Cursor
+from .manifest import manifest_remove
+from .catalog import remove_metadata
+
+def lock_images(cursor: Cursor, names: list[str]) -> None:
+    # 写入事件前对引用的图片加共享锁，与回收时的排他锁互斥，避免刚被引用就被清扫
+    names = [name for name in names if name]
+    if not names: return None
+    marks = ", ".join(["%s"] * len(names))
+    cursor.execute(
+        f"SELECT name FROM images WHERE name IN ({marks}) FOR SHARE;", names
+    )
+
+def release_image(cursor: Cursor, name: str) -> bool:
+    cursor.execute("SELECT name FROM images WHERE name = %s FOR UPDATE;", (name, ))
+    cursor.execute("SELECT 1 FROM events WHERE image_hash = %s LIMIT 1;", (name, ))
+    if cursor.fetchone() is not None: return False
+    manifest_remove(cursor, name)
+    remove_metadata(cursor, name)
+    return True
+
+def find_orphans(cursor: Cursor, before: float, limit: int) -> list[str]:
+    cursor.execute(
+"""SELECT i.name FROM images AS i
+LEFT JOIN events AS e ON e.image_hash = i.name
+WHERE e.uuid IS NULL AND i.mtime < %s
+ORDER BY i.mtime
+LIMIT %s;
+""", (before, limit))
+    return [row[0] for row in cursor.fetchall()]
+
+def find_dangling(cursor: Cursor, limit: int) -> list[tuple[str, str]]:
+    cursor.execute(
+"""SELECT e.uuid, e.image_hash FROM events AS e
+LEFT JOIN images AS i ON i.name = e.image_hash
+WHERE e.image_hash IS NOT NULL AND e.image_hash <> '' AND i.name IS NULL
+LIMIT %s;
+""", (limit, ))
+    return cursor.fetchall()
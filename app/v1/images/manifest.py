@@ -0,0 +1,88 @@
+
+from pymysql.cursors import Cursor
+from pymysql.connections import Connection
+from .store import FileStore
+from .packs import TieredStore
+
+def manifest_add(
+    cursor: Cursor, name: str, size: int, mtime: float, original: int
+) -> None:
+    cursor.execute(
+        "INSERT IGNORE INTO images (name, size, mtime, original) VALUES (%s, %s, %s, %s);",
+        (name, size, mtime, original)
+    )
+    if cursor.rowcount:
+        cursor.execute(
+"""UPDATE image_totals
+SET count = count + 1, size = size + %s, original = original + %s
+WHERE id = 1;
+""", (size, original))
+
+def manifest_remove(cursor: Cursor, name: str) -> None:
+    cursor.execute(
+        "SELECT size, original FROM images WHERE name = %s FOR UPDATE;", (name, )
+    )
+    if (row := cursor.fetchone()) is None: return None
+    cursor.execute("DELETE FROM images WHERE name = %s;", (name, ))
+    cursor.execute(
+"""UPDATE image_totals
+SET count = count - 1, size = size - %s, original = original - %s
+WHERE id = 1;
+""", row)
+
+def manifest_totals(cursor: Cursor) -> tuple[int, int, int] | None:
+    cursor.execute("SELECT count, size, original FROM image_totals WHERE id = 1;")
+    row = cursor.fetchone()
+    return (int(row[0]), int(row[1]), int(row[2])) if row else None
+
+def manifest_list(
+    cursor: Cursor, prefix: str, after: str, limit: int
+) -> list[tuple[str, int, float, int]]:
+    pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    cursor.execute(
+"""SELECT name, size, mtime, original FROM images
+WHERE name LIKE %s AND name > %s
+ORDER BY name
+LIMIT %s;
+""", (pattern + '%', after, limit))
+    return cursor.fetchall()
+
+# 以图片库目录为准修正清单并重算汇总，返回 (新增, 移除, 更新) 条数
+
+def reconcile(db: Connection, store: FileStore | TieredStore) -> tuple[int, int, int]:
+    found = store.scan()
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT name, size, mtime FROM images;")
+        known = {name: (size, mtime) for name, size, mtime in cursor.fetchall()}
+        added = [name for name in found if name not in known]
+        changed = [
+            name for name in found
+            if name in known and known[name] != found[name]
+        ]
+        # 扫描之后才发布的文件不在 found 里，删除前再确认一次
+        removed = [
+            name for name in known
+            if name not in found and not store.exists(name)
+        ]
+        # 目录里只有优化后的文件，原始大小无从得知：新增的按当前大小记，已有的保留
+        if added or changed:
+            cursor.executemany(
+"""INSERT INTO images (name, size, mtime, original) VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE size = VALUES(size), mtime = VALUES(mtime);
+""", [(name, *found[name], found[name][0]) for name in added + changed])
+        if removed:
+            cursor.executemany(
+                "DELETE FROM images WHERE name = %s;", [(name, ) for name in removed]
+            )
+        cursor.execute(
+"""REPLACE INTO image_totals (id, count, size, original)
+SELECT 1, COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(original), 0) FROM images;
+""")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(added), len(removed), len(changed)
@@ -0,0 +1,81 @@
+
+from collections import OrderedDict
+
+class BytesCache:
+
+    _limit: int
+    _max_object: int
+    _admit_after: int
+    _sketch_size: int
+    # 键为响应的 ETag，值为 (字节视图, 媒体类型, 实际返回的 ETag)
+    _entries: OrderedDict[str, tuple[memoryview, str, str]]
+    _seen: dict[str, int]
+    _total: int
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(
+        self, limit: int, max_object: int, admit_after: int, sketch_size: int
+    ):
+        self._limit = limit
+        self._max_object = max_object
+        self._admit_after = admit_after
+        self._sketch_size = sketch_size
+        self._entries = OrderedDict()
+        self._seen = {}
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def size(self) -> int:
+        return self._total
+
+    @property
+    def count(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> tuple[memoryview, str, str] | None:
+        if (entry := self._entries.get(key)) is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def admit(self, key: str, size: int) -> bool:
+        # 只收小图，且同一个键要被请求足够多次；计数表满了就整体减半，旧热点自然淡出
+        if size > self._max_object or size > self._limit: return False
+        count = self._seen.get(key, 0) + 1
+        self._seen[key] = count
+        if len(self._seen) > self._sketch_size:
+            self._seen = {k: v // 2 for k, v in self._seen.items() if v > 1}
+        return count >= self._admit_after
+
+    def put(self, key: str, data: bytes, media_type: str, etag: str) -> memoryview:
+        view = memoryview(data)
+        if (old := self._entries.pop(key, None)) is not None:
+            self._total -= len(old[0])
+        self._entries[key] = (view, media_type, etag)
+        self._total += len(view)
+        while self._total > self._limit:
+            _, (evicted, _, _) = self._entries.popitem(last=False)
+            self._total -= len(evicted)
+            self.evictions += 1
+        return view
+
+    def discard(self, base: str) -> None:
+        # base 为不带结尾引号的原图 ETag，尺寸与格式变体都以 "-" 接在其后
+        victims = [
+            key for key in self._entries
+            if key[:-1] == base or key.startswith(base + "-")
+        ]
+        for key in victims:
+            self._total -= len(self._entries.pop(key)[0])
+            self._seen.pop(key, None)
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as rd:
+        return rd.read()
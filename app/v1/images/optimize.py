@@ -0,0 +1,105 @@
+
+import io
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageOps
+from .workers import WorkerPool
+
+ORIENTATION = 0x0112
+# 决定颜色的 APP 段保留，其余 APP 段（EXIF、XMP、Photoshop 等）与注释一律去掉
+JPEG_KEEP = {0xE0: b"JFIF", 0xE2: b"ICC_PROFILE", 0xEE: b"Adobe"}
+JPEG_COMMENT = 0xFE
+JPEG_SOS = 0xDA
+
+def orientation_segment(orientation: int) -> bytes:
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    payload = exif.tobytes()
+    return b"\xff\xe1" + (len(payload) + 2).to_bytes(2, "big") + payload
+
+def strip_jpeg(data: bytes, orientation: int) -> bytes:
+    # 只删除扫描数据之前的元数据段，像素数据原样保留；方向不为 1 时补回只含方向的 EXIF
+    segments = []
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF: return data
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == JPEG_SOS:
+            break
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+        segment = data[pos:end]
+        keep = JPEG_KEEP.get(marker)
+        if marker == JPEG_COMMENT or (
+            0xE0 <= marker <= 0xEF and (keep is None or not segment[4:].startswith(keep))
+        ):
+            pos = end
+            continue
+        segments.append(segment)
+        pos = end
+    else:
+        return data
+    if orientation != 1:
+        at = 1 if segments and segments[0][1] == 0xE0 else 0
+        segments.insert(at, orientation_segment(orientation))
+    return b"\xff\xd8" + b"".join(segments) + data[pos:]
+
+def optimize_jpeg(data: bytes, image: Image.Image, progressive: bool) -> bytes:
+    orientation = image.getexif().get(ORIENTATION, 1)
+    result = strip_jpeg(data, orientation)
+    if progressive:
+        # 沿用原量化表与采样重新编码，不是逐位无损，由配置单独开启
+        buffer = io.BytesIO()
+        options = {}
+        if orientation != 1: options["exif"] = orientation_segment(orientation)[4:]
+        if icc := image.info.get("icc_profile"): options["icc_profile"] = icc
+        image.save(
+            buffer, format="JPEG", quality="keep", subsampling="keep",
+            optimize=True, progressive=True, **options
+        )
+        if buffer.tell() < len(result): result = buffer.getvalue()
+    return result
+
+def optimize_png(data: bytes, image: Image.Image) -> bytes:
+    # 16 位彩色 PNG 读入后会降为 8 位，不是无损，原样保留
+    if data[24] == 16 and data[25] != 0: return data
+    if getattr(image, "n_frames", 1) > 1: return data
+    # 旋转与翻转是无损的，直接应用方向后丢弃 EXIF；不传 pnginfo 即去掉文本块
+    image = ImageOps.exif_transpose(image)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+def optimize_image(data: bytes, progressive: bool) -> bytes:
+    # 只处理 JPEG 与 PNG，其他格式、无法解码的内容以及没有变小的结果都返回原字节
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format == "JPEG":
+                result = optimize_jpeg(data, image, progressive)
+            elif image.format == "PNG":
+                result = optimize_png(data, image)
+            else:
+                return data
+    except Exception:
+        return data
+    return result if len(result) < len(data) else data
+
+class ImageOptimizer:
+
+    _progressive: bool
+    _pool: WorkerPool
+
+    def __init__(self, workers: int, progressive: bool):
+        self._progressive = progressive
+        self._pool = WorkerPool(workers)
+
+    async def optimize(self, data: bytes) -> bytes:
+        try:
+            return await self._pool.run(optimize_image, data, self._progressive)
+        except BrokenProcessPool:
+            # 与无法解码时一样保留原字节，入库不因优化失败而失败
+            return data
+
+    def shutdown(self) -> None:
+        self._pool.shutdown()
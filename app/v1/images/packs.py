@@ -0,0 +1,226 @@
+
+import os
+import mmap
+import time
+import struct
+import hashlib
+import threading
+from typing import Iterator, NamedTuple
+from .store import FileStore, StoredImage, name_digest
+
+# 记录头：类型、文件名长度、数据长度、写入时间；之后依次是文件名与数据
+HEADER = struct.Struct("<BHId")
+PUT, DELETE = 1, 0
+PACK_PREFIX = "pack-"
+PACK_SUFFIX = ".kxp"
+
+class PackEntry(NamedTuple):
+    pack: int
+    offset: int
+    length: int
+    mtime: float
+
+class PackStore:
+
+    _root: str
+    _pack_size: int
+    _index: dict[str, PackEntry]
+    _maps: dict[int, mmap.mmap]
+    # 每个包的 [总字节数, 仍被索引引用的数据字节数]，用于判断是否值得压缩
+    _usage: dict[int, list[int]]
+    _active: int
+    _lock: threading.Lock
+
+    def __init__(self, root: str, pack_size: int):
+        self._root = root
+        self._pack_size = pack_size
+        self._index = {}
+        self._maps = {}
+        self._usage = {}
+        self._active = 1
+        self._lock = threading.Lock()
+
+    def _pack_path(self, pack: int) -> str:
+        return os.path.join(self._root, f"{PACK_PREFIX}{pack:06d}{PACK_SUFFIX}")
+
+    def _records(self, pack: int) -> Iterator[tuple[int, str, PackEntry]]:
+        path = self._pack_path(pack)
+        size = os.path.getsize(path)
+        offset = 0
+        with open(path, "rb") as rd:
+            while offset + HEADER.size <= size:
+                kind, name_len, length, mtime = HEADER.unpack(rd.read(HEADER.size))
+                end = offset + HEADER.size + name_len + length
+                if end > size: break
+                name = rd.read(name_len).decode("utf-8")
+                rd.seek(length, os.SEEK_CUR)
+                yield kind, name, PackEntry(
+                    pack, offset + HEADER.size + name_len, length, mtime
+                )
+                offset = end
+
+    def load(self) -> None:
+        os.makedirs(self._root, exist_ok=True)
+        packs = sorted(
+            int(name[len(PACK_PREFIX):-len(PACK_SUFFIX)])
+            for name in os.listdir(self._root)
+            if name.startswith(PACK_PREFIX) and name.endswith(PACK_SUFFIX)
+        )
+        with self._lock:
+            self._index.clear()
+            self._maps.clear()
+            self._usage.clear()
+            # 按包号顺序重放，同名记录以最后一条为准
+            for pack in packs:
+                usage = self._usage[pack] = [0, 0]
+                for kind, name, entry in self._records(pack):
+                    if (old := self._index.pop(name, None)) is not None:
+                        self._usage[old.pack][1] -= old.length
+                    if kind == PUT:
+                        self._index[name] = entry
+                        usage[1] += entry.length
+                    usage[0] = entry.offset + entry.length
+            self._active = packs[-1] if packs else 1
+
+    def _append(
+        self, kind: int, name: str, data: bytes | memoryview, mtime: float
+    ) -> PackEntry:
+        if self._usage.get(self._active, [0])[0] >= self._pack_size:
+            self._active += 1
+        pack = self._active
+        encoded = name.encode("utf-8")
+        usage = self._usage.setdefault(pack, [0, 0])
+        with open(self._pack_path(pack), "ab") as wt:
+            if wt.tell() != usage[0]:
+                # 写到一半崩溃留下的残缺记录，追加前截掉
+                wt.truncate(usage[0])
+            offset = usage[0]
+            wt.write(HEADER.pack(kind, len(encoded), len(data), mtime))
+            wt.write(encoded)
+            wt.write(data)
+            wt.flush()
+            os.fsync(wt.fileno())
+        usage[0] = offset + HEADER.size + len(encoded) + len(data)
+        if kind == PUT: usage[1] += len(data)
+        return PackEntry(pack, offset + HEADER.size + len(encoded), len(data), mtime)
+
+    def _view(self, entry: PackEntry) -> memoryview:
+        mapped = self._maps.get(entry.pack)
+        if mapped is None or len(mapped) < entry.offset + entry.length:
+            # 活动包只会追加，映射过短时重新映射；旧映射随引用它的视图一起释放
+            with open(self._pack_path(entry.pack), "rb") as rd:
+                mapped = mmap.mmap(rd.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[entry.pack] = mapped
+        return memoryview(mapped)[entry.offset:entry.offset + entry.length]
+
+    def get(self, name: str) -> StoredImage | None:
+        with self._lock:
+            if (entry := self._index.get(name)) is None: return None
+            return StoredImage(None, self._view(entry), None, entry.length, entry.mtime)
+
+    def exists(self, name: str) -> bool:
+        return name in self._index
+
+    def put(self, data: bytes, name: str) -> None:
+        with self._lock:
+            if name in self._index: return None
+            self._index[name] = self._append(PUT, name, data, time.time())
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            if (entry := self._index.pop(name, None)) is None:
+                raise FileNotFoundError(name)
+            self._append(DELETE, name, b"", time.time())
+            self._usage[entry.pack][1] -= entry.length
+
+    def scan(self) -> dict[str, tuple[int, float]]:
+        with self._lock:
+            return {
+                name: (entry.length, entry.mtime)
+                for name, entry in self._index.items()
+            }
+
+    def compact(self, ratio: float) -> int:
+        # 把失效数据占比超过 ratio 的已封存包里的存活记录搬到活动包，再删除旧包，
+        # 每条记录单独加锁，压缩期间读写不会被长时间阻塞；返回回收的字节数
+        with self._lock:
+            candidates = sorted(
+                pack for pack, (total, live) in self._usage.items()
+                if pack != self._active and total and (total - live) / total > ratio
+            )
+        reclaimed = 0
+        for pack in candidates:
+            for kind, name, entry in self._records(pack):
+                with self._lock:
+                    if kind == PUT and self._index.get(name) == entry:
+                        self._index[name] = self._append(
+                            PUT, name, self._view(entry), entry.mtime
+                        )
+                    elif (
+                        kind == DELETE and name not in self._index
+                        and any(older < pack for older in self._usage)
+                    ):
+                        # 更早的包里可能还有该文件的 PUT 记录，墓碑要跟着保留
+                        self._append(DELETE, name, b"", entry.mtime)
+            with self._lock:
+                total, live = self._usage.pop(pack)
+                self._maps.pop(pack, None)
+                os.remove(self._pack_path(pack))
+            reclaimed += total - live
+        return reclaimed
+
+class TieredStore:
+
+    _files: FileStore
+    _packs: PackStore
+    _threshold: int
+
+    def __init__(self, files: FileStore, packs: PackStore, threshold: int):
+        self._files = files
+        self._packs = packs
+        self._threshold = threshold
+
+    @property
+    def packs(self) -> PackStore:
+        return self._packs
+
+    def load(self) -> None:
+        self._files.load()
+        self._packs.load()
+
+    def purge_temp(self) -> None:
+        self._files.purge_temp()
+
+    def get(self, name: str) -> StoredImage:
+        if (item := self._packs.get(name)) is not None: return item
+        return self._files.get(name)
+
+    def exists(self, name: str) -> bool:
+        return self._packs.exists(name) or self._files.exists(name)
+
+    def remove(self, name: str) -> None:
+        if self._packs.exists(name):
+            self._packs.remove(name)
+        else:
+            self._files.remove(name)
+
+    def publish(self, source: str, name: str) -> bool:
+        if os.path.getsize(source) > self._threshold:
+            return self._files.publish(source, name)
+        with open(source, "rb") as rd:
+            data = rd.read()
+        os.remove(source)
+        return self.write(data, name)
+
+    def write(self, data: bytes, name: str, verified: bool = False) -> bool:
+        if len(data) > self._threshold:
+            return self._files.write(data, name, verified)
+        if not verified and hashlib.sha256(data).hexdigest() != name_digest(name):
+            return False
+        self._packs.put(data, name)
+        return True
+
+    def scan(self) -> dict[str, tuple[int, float]]:
+        found = self._files.scan()
+        found.update(self._packs.scan())
+        return found
@@ -0,0 +1,166 @@
+
+import os
+import hashlib
+import tempfile
+from typing import NamedTuple
+
+HASH_CHUNK = 1024 * 1024
+TEMP_PREFIX = ".upload-"
+# 迁移工具把所有平铺文件移入分片目录后写下该标记，之后不再回退查找平铺路径
+SHARDED_MARKER = ".sharded"
+
+def name_digest(name: str) -> str:
+    stem, _ = os.path.splitext(name)
+    return stem.lower()
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as rd:
+        while chunk := rd.read(HASH_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+# 独立文件给出 path 与 stat，打包存储给出映射内存的 data 视图
+
+class StoredImage(NamedTuple):
+    path: str | None
+    data: memoryview | None
+    stat: os.stat_result | None
+    size: int
+    mtime: float
+
+class FileStore:
+
+    _root: str
+    _flat: bool
+
+    def __init__(self, root: str):
+        self._root = root
+        self._flat = True
+
+    def load(self) -> None:
+        os.makedirs(self._root, exist_ok=True)
+        self._flat = not os.path.exists(os.path.join(self._root, SHARDED_MARKER))
+
+    def purge_temp(self) -> None:
+        # 进程崩溃时遗留的临时文件，从未发布过，直接删除
+        with os.scandir(self._root) as it:
+            for entry in it:
+                if entry.name.startswith(TEMP_PREFIX):
+                    os.remove(entry.path)
+
+    def flat_path(self, name: str) -> str:
+        return os.path.join(self._root, name)
+
+    def path(self, name: str) -> str:
+        # ab/cd/<hash>.<ext>，两级各 256 个目录
+        digest = name_digest(name)
+        if len(digest) < 4: return self.flat_path(name)
+        return os.path.join(self._root, digest[:2], digest[2:4], name)
+
+    def stat(self, name: str) -> tuple[str, os.stat_result]:
+        sharded = self.path(name)
+        if not self._flat:
+            return sharded, os.stat(sharded)
+        # 迁移先建硬链接再删平铺文件，前两次都查不到时分片路径必然已经就绪
+        for path in (sharded, self.flat_path(name), sharded):
+            try:
+                return path, os.stat(path)
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(sharded)
+
+    def get(self, name: str) -> StoredImage:
+        path, stat = self.stat(name)
+        return StoredImage(path, None, stat, stat.st_size, stat.st_mtime)
+
+    def exists(self, name: str) -> bool:
+        # 名字过长（ENAMETOOLONG）或含 NUL 同样视为不存在，批量检查时只影响该项
+        try:
+            self.stat(name)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def remove(self, name: str) -> None:
+        paths = [self.path(name)]
+        if self._flat: paths.append(self.flat_path(name))
+        removed = False
+        for path in paths:
+            try:
+                os.remove(path)
+                removed = True
+            except FileNotFoundError:
+                continue
+        if not removed: raise FileNotFoundError(paths[0])
+
+    # 内容寻址：同名即同内容，并发发布时互相覆盖也只是写入相同字节。开启入库优化时
+    # 文件名是原始上传内容的哈希，调用方先校验原始内容，再以 verified 写入优化结果
+
+    def publish(self, source: str, name: str) -> bool:
+        if file_digest(source) != name_digest(name):
+            os.remove(source)
+            return False
+        with open(source, "rb+") as fd:
+            os.fsync(fd.fileno())
+        target = self.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source, target)
+        return True
+
+    def write(self, data: bytes, name: str, verified: bool = False) -> bool:
+        if not verified and hashlib.sha256(data).hexdigest() != name_digest(name):
+            return False
+        fd, temp = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self._root)
+        try:
+            with os.fdopen(fd, "wb") as wt:
+                wt.write(data)
+                wt.flush()
+                os.fsync(wt.fileno())
+            target = self.path(name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(temp, target)
+        except BaseException:
+            os.remove(temp)
+            raise
+        return True
+
+    def scan(self) -> dict[str, tuple[int, float]]:
+        found = {}
+        for folder, dirs, files in os.walk(self._root):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            for name in files:
+                if name.startswith('.'): continue
+                stat = os.stat(os.path.join(folder, name))
+                found[name] = (stat.st_size, stat.st_mtime)
+        return found
+
+    def migrate(self) -> int:
+        # 把平铺在根目录的文件移入分片目录，服务运行时也可执行
+        with os.scandir(self._root) as it:
+            names = [
+                entry.name for entry in it
+                if entry.is_file() and not entry.name.startswith('.')
+            ]
+        moved = 0
+        for name in names:
+            source, target = self.flat_path(name), self.path(name)
+            if source == target: continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(source, target)
+            except FileExistsError:
+                pass
+            except FileNotFoundError:
+                continue
+            except OSError:
+                # 不支持硬链接的文件系统退化为 rename，读取方会再回查一次分片路径
+                os.replace(source, target)
+                moved += 1
+                continue
+            os.remove(source)
+            moved += 1
+        with open(os.path.join(self._root, SHARDED_MARKER), "w"):
+            pass
+        self._flat = False
+        return moved
@@ -0,0 +1,123 @@
+
+import os
+import time
+import asyncio
+import secrets
+import weakref
+import aiofiles
+from typing import AsyncIterator
+from .store import FileStore
+from .packs import TieredStore
+
+class UploadSessions:
+
+    _root: str
+    _ttl: float
+    _locks: weakref.WeakValueDictionary[str, asyncio.Lock]
+
+    def __init__(self, root: str, ttl: float):
+        self._root = root
+        self._ttl = ttl
+        self._locks = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def valid_session(session: str) -> bool:
+        return len(session) == 32 and all(c in "0123456789abcdef" for c in session)
+
+    def _paths(self, session: str) -> tuple[str, str]:
+        part = os.path.join(self._root, session)
+        return part, part + ".size"
+
+    def lock(self, session: str) -> asyncio.Lock:
+        # 只弱引用：会话号未经鉴权，不存在的会话在请求结束后不会留下锁
+        if (lock := self._locks.get(session)) is None:
+            lock = self._locks[session] = asyncio.Lock()
+        return lock
+
+    def purge(self) -> None:
+        # 超过 TTL 未再写入的会话视为放弃：以分块文件的修改时间为准，两个文件一起删除；
+        # 只剩 .size 的会话（创建中途崩溃）按其自身时间判断
+        os.makedirs(self._root, exist_ok=True)
+        deadline = time.time() - self._ttl
+        with os.scandir(self._root) as it:
+            sessions = {
+                entry.name.removesuffix(".size")
+                for entry in it if entry.is_file()
+            }
+        for session in sessions:
+            part, meta = self._paths(session)
+            try:
+                expired = os.path.getmtime(part) < deadline
+            except FileNotFoundError:
+                try:
+                    expired = os.path.getmtime(meta) < deadline
+                except FileNotFoundError:
+                    continue
+            # 正在写入的会话不动
+            lock = self._locks.get(session)
+            if not expired or (lock is not None and lock.locked()): continue
+            for path in (part, meta):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._locks.pop(session, None)
+
+    def create(self, size: int) -> str:
+        self.purge()
+        session = secrets.token_hex(16)
+        part, meta = self._paths(session)
+        # 先写大小再建分块文件，state 只在两者都存在时才认为会话有效
+        with open(meta, "w") as wt:
+            wt.write(str(size))
+        open(part, "wb").close()
+        return session
+
+    def state(self, session: str) -> tuple[int, int] | None:
+        part, meta = self._paths(session)
+        try:
+            with open(meta) as rd:
+                size = int(rd.read())
+            return os.path.getsize(part), size
+        except (OSError, ValueError):
+            return None
+
+    async def write(
+        self, session: str, offset: int, size: int, chunks: AsyncIterator[bytes]
+    ) -> int:
+        part, _ = self._paths(session)
+        async with aiofiles.open(part, "r+b") as wt:
+            await wt.seek(offset)
+            remaining = size - offset
+            async for chunk in chunks:
+                if len(chunk) > remaining:
+                    # 超出声明大小：丢弃本次写入
+                    await wt.truncate(offset)
+                    raise ValueError("chunk exceeds declared size")
+                await wt.write(chunk)
+                remaining -= len(chunk)
+            return size - remaining
+
+    def read(self, session: str) -> bytes:
+        part, _ = self._paths(session)
+        with open(part, "rb") as rd:
+            return rd.read()
+
+    def discard(self, session: str) -> None:
+        for path in self._paths(session):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._locks.pop(session, None)
+
+    def finish(self, session: str, store: FileStore | TieredStore, name: str) -> bool:
+        part, meta = self._paths(session)
+        try:
+            if store.exists(name):
+                os.remove(part)
+                return True
+            return store.publish(part, name)
+        finally:
+            os.remove(meta)
+            self._locks.pop(session, None)
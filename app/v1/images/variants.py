@@ -0,0 +1,181 @@
+
+import io
+import os
+import asyncio
+from collections import OrderedDict
+from PIL import Image, ImageOps, features
+from .workers import WorkerPool
+
+FITS = ("contain", "cover", "fill")
+
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 80, "method": 4},
+    "AVIF": {"quality": 60, "speed": 6},
+}
+
+# 转码目标按扩展名区分：PNG 多为截图和线稿，只转无损 WebP；AVIF 只给照片类的 JPEG
+TRANSCODE_TARGETS = {
+    ".jpg": ("avif", "webp"),
+    ".jpeg": ("avif", "webp"),
+    ".png": ("webp", ),
+}
+
+def transcode_targets(name: str, preferred: tuple[str, ...]) -> tuple[str, ...]:
+    _, ext = os.path.splitext(name)
+    allowed = TRANSCODE_TARGETS.get(ext.lower(), ())
+    return tuple(
+        fmt for fmt in preferred if fmt in allowed and features.check(fmt)
+    )
+
+def save_options(source: str, target: str) -> dict:
+    if source == "PNG" and target == "WEBP":
+        return {"lossless": True, "method": 4}
+    return SAVE_OPTIONS.get(target, {})
+
+def normalize_mode(image: Image.Image) -> Image.Image:
+    # 16 位灰度（I;16）、32 位整数（I）与浮点（F）图不能直接重采样，也存不成 WebP/JPEG，
+    # 按实际取值范围线性映射到 8 位灰度
+    if image.mode.startswith("I;"): image = image.convert("I")
+    if image.mode not in ("I", "F"): return image
+    low, high = image.getextrema()
+    scale = 255 / (high - low) if high > low else 0
+    offset = -low * scale
+    return image.point(lambda v: v * scale + offset).convert("L")
+
+def render_variant(
+    source: str | bytes, target: str, width: int, height: int, fit: str,
+    fmt: str = ""
+) -> int:
+    if isinstance(source, bytes): source = io.BytesIO(source)
+    with Image.open(source) as image:
+        source_fmt = image.format
+        target_fmt = fmt.upper() or source_fmt
+        image = normalize_mode(ImageOps.exif_transpose(image))
+        if fit == "cover" and width and height:
+            image = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        elif fit == "fill" and width and height:
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        else:
+            # contain：等比缩放到框内，不放大
+            box = (width or image.width, height or image.height)
+            image.thumbnail(box, Image.Resampling.LANCZOS)
+        if target_fmt == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        temp = f"{target}.{os.getpid()}.tmp"
+        image.save(
+            temp, format=target_fmt, **save_options(source_fmt, target_fmt)
+        )
+    os.replace(temp, target)
+    return os.path.getsize(target)
+
+def remove_files(paths: list[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class VariantCache:
+
+    _root: str
+    _limit: int
+    _entries: OrderedDict[str, int]
+    _total: int
+    _pending: dict[str, asyncio.Future]
+    _pool: WorkerPool
+
+    def __init__(self, root: str, limit: int, workers: int = 2):
+        self._root = root
+        self._limit = limit
+        self._entries = OrderedDict()
+        self._total = 0
+        self._pending = {}
+        self._pool = WorkerPool(workers)
+
+    @staticmethod
+    def variant_name(
+        name: str, width: int, height: int, fit: str, fmt: str = ""
+    ) -> str:
+        stem, ext = os.path.splitext(name)
+        if fmt: ext = f".{fmt}"
+        return f"{stem}_{width}x{height}_{fit}{ext}"
+
+    def _scan(self) -> list[tuple[str, int, float]]:
+        os.makedirs(self._root, exist_ok=True)
+        found = []
+        with os.scandir(self._root) as it:
+            for entry in it:
+                if not entry.is_file(): continue
+                if entry.name.endswith(".tmp"):
+                    os.remove(entry.path)
+                    continue
+                stat = entry.stat()
+                found.append((entry.name, stat.st_size, stat.st_atime))
+        found.sort(key=lambda item: item[2])
+        return found
+
+    async def load(self) -> None:
+        self._entries.clear()
+        self._total = 0
+        for name, size, _ in await asyncio.to_thread(self._scan):
+            self._entries[name] = size
+            self._total += size
+
+    def shutdown(self) -> None:
+        self._pool.shutdown()
+
+    def _evict(self) -> list[str]:
+        victims = []
+        while self._total > self._limit and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            victims.append(os.path.join(self._root, name))
+        return victims
+
+    async def get(
+        self, source: str | bytes, name: str, width: int, height: int, fit: str,
+        fmt: str = ""
+    ) -> str:
+        key = self.variant_name(name, width, height, fit, fmt)
+        path = os.path.join(self._root, key)
+        if key in self._entries:
+            if os.path.exists(path):
+                self._entries.move_to_end(key)
+                return path
+            # 被其它 worker 淘汰或被手工删除：丢掉记录重新渲染
+            self._total -= self._entries.pop(key)
+        if (pending := self._pending.get(key)) is not None:
+            await asyncio.shield(pending)
+            return path
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            size = await self._pool.run(
+                render_variant, source, path, width, height, fit, fmt
+            )
+            self._entries[key] = size
+            self._total += size
+            future.set_result(path)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其它等待者时避免 "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+        if victims := self._evict():
+            await asyncio.to_thread(remove_files, victims)
+        return path
+
+    def discard(self, name: str) -> list[str]:
+        stem, _ = os.path.splitext(name)
+        victims = [key for key in self._entries if key.startswith(stem + "_")]
+        for key in victims:
+            self._total -= self._entries.pop(key)
+        return [os.path.join(self._root, key) for key in victims]
@@ -0,0 +1,34 @@
+
+import asyncio
+from typing import Any, Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+class WorkerPool:
+
+    _workers: int
+    _executor: ProcessPoolExecutor | None
+
+    def __init__(self, workers: int):
+        self._workers = workers
+        self._executor = None
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        # 首次使用时才创建进程池，不渲染图片的部署不必常驻工作进程
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self._workers)
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # 工作进程被杀（如解码大图时 OOM）后整个池不再可用，丢弃后下次重建
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
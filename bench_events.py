@@ -0,0 +1,112 @@
+
+import sys, time, random, statistics
+import pymysql
+from datetime import datetime, timedelta
+from uuid import uuid4
+from app import schema
+from app.config import MYSQL_HOST, MYSQL_PORT, MYSQL_AUTH
+
+DATABASE = "kxpage_bench"
+ROWS = 1_000_000
+BATCH = 10_000
+ROUNDS = 50
+
+WINDOW_QUERY = """SELECT uuid, ev_time, ev_title, ev_href, ev_desc, image_hash
+FROM events
+WHERE ev_time >= DATE_SUB(%s, INTERVAL 6 MONTH)
+  AND ev_time < %s
+ORDER BY ev_time DESC;
+"""
+
+PAGE_QUERY = """SELECT uuid, ev_time, ev_title, ev_href, ev_desc, image_hash
+FROM events
+WHERE ev_time < %s OR (ev_time = %s AND uuid < %s)
+ORDER BY ev_time DESC, uuid DESC
+LIMIT 50;
+"""
+
+def connect(database: str | None = None) -> pymysql.connections.Connection:
+    user, password = MYSQL_AUTH.split(':')
+    return pymysql.connect(
+        host=MYSQL_HOST, port=MYSQL_PORT, user=user, password=password,
+        database=database
+    )
+
+def populate(db: pymysql.connections.Connection, rows: int) -> None:
+    cursor = db.cursor()
+    cursor.execute("SELECT COUNT(*) FROM events;")
+    existing = cursor.fetchone()[0]
+    start = datetime(2000, 1, 1)
+    span = int((datetime(2026, 1, 1) - start).total_seconds())
+    for offset in range(existing, rows, BATCH):
+        batch = [
+            (
+                str(uuid4()), start + timedelta(seconds=random.randrange(span)),
+                f"event {offset + i}", None, None, "benchmark row"
+            )
+            for i in range(min(BATCH, rows - offset))
+        ]
+        cursor.executemany(
+            "INSERT INTO events (uuid, ev_time, ev_title, ev_href, image_hash, ev_desc) "
+            "VALUES (%s, %s, %s, %s, %s, %s)", batch
+        )
+        db.commit()
+        print(f"\rinserted {offset + len(batch)}/{rows}", end="", flush=True)
+    print()
+    cursor.execute("ANALYZE TABLE events;")
+    cursor.fetchall()
+    cursor.close()
+
+def explain(db: pymysql.connections.Connection, query: str, args: tuple) -> None:
+    cursor = db.cursor()
+    cursor.execute("EXPLAIN " + query, args)
+    names = [column[0] for column in cursor.description]
+    for row in cursor.fetchall():
+        print("  " + ", ".join(f"{k}={v}" for k, v in zip(names, row) if v is not None))
+    cursor.close()
+
+def measure(db: pymysql.connections.Connection, query: str, make_args) -> None:
+    cursor = db.cursor()
+    timings, sizes = [], []
+    for _ in range(ROUNDS):
+        args = make_args()
+        begin = time.perf_counter()
+        cursor.execute(query, args)
+        sizes.append(len(cursor.fetchall()))
+        timings.append((time.perf_counter() - begin) * 1000)
+    cursor.close()
+    timings.sort()
+    print(
+        f"  rows avg {statistics.mean(sizes):.0f}, "
+        f"p50 {timings[len(timings) // 2]:.2f} ms, "
+        f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms"
+    )
+
+def random_time() -> str:
+    moment = datetime(2001, 1, 1) + timedelta(days=random.randrange(365 * 25))
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    server = connect()
+    cursor = server.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DATABASE} DEFAULT CHARSET utf8mb4;")
+    cursor.close()
+    server.close()
+
+    db = connect(DATABASE)
+    print("migrations applied:", schema.migrate(db) or "none")
+    schema.verify(db)
+    populate(db, rows)
+
+    target = random_time()
+    print("window query plan:")
+    explain(db, WINDOW_QUERY, (target, target))
+    print("keyset page plan:")
+    explain(db, PAGE_QUERY, (target, target, ""))
+
+    print(f"window query x{ROUNDS}:")
+    measure(db, WINDOW_QUERY, lambda: (t := random_time(), t))
+    print(f"keyset page x{ROUNDS}:")
+    measure(db, PAGE_QUERY, lambda: (t := random_time(), t, ""))
+    db.close()
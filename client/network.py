@@ -3,7 +3,8 @@ import os
 import requests
 import hashlib
 from base64 import urlsafe_b64encode
-from typing import TypedDict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict, Optional, Literal
 from google.protobuf.message import Message
 from uuid import uuid4 as random_uuid, UUID
 from datetime import datetime
@@ -11,6 +12,7 @@ from .pbf import Event_pb2
 
 class StorageInfo(TypedDict):
     size: int
+    original: int
     count: int
     files: list[str]
 
@@ -22,6 +24,13 @@ class EventSpec(TypedDict, total=False):
     time: str
     image: str
 
+class ImageMeta(TypedDict):
+    width: int
+    height: int
+    format: str
+    size: int
+    lqip: bytes
+
 class StateResponse(TypedDict):
     message: str
 
@@ -30,10 +39,20 @@ PBF_HEADER = {
     "Content-Type": "application/octet-stream"
 }
 
+# 超过该大小的图片走分块上传会话
+UPLOAD_SESSION_THRESHOLD = 8 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024
+UPLOAD_RETRIES = 5
+# 批量上传：单个请求的条目与字节上限，以及同时在途的请求数
+IMAGE_BATCH_MAX = 500
+UPLOAD_BATCH_BYTES = 16 * 1024 * 1024
+UPLOAD_PIPELINE = 3
+
 class KXPageClient:
     
     _host_url: str
     _admin_hash: str
+    _feed_cache: dict[str, tuple[str, bytes]]
 
     def __init__(
         self, url: str = "http://localhost:8000",
@@ -43,10 +62,22 @@ class KXPageClient:
         h = hashlib.sha512()
         h.update(password.encode("utf-8"))
         self._admin_hash = h.hexdigest()
+        self._feed_cache = {}
     
     # Images
 
+    @staticmethod
+    def _hashed_name(path: str) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as rd:
+            while chunk := rd.read(UPLOAD_CHUNK_SIZE):
+                h.update(chunk)
+        _, ext_name = os.path.splitext(os.path.normpath(path))
+        return h.hexdigest() + ext_name
+
     def upload_image(self, path: str) -> StateResponse:
+        if os.path.getsize(path) > UPLOAD_SESSION_THRESHOLD:
+            return self._upload_session(path, self._hashed_name(path))
         with open(path, "rb") as rd:
             image_data = rd.read()
         h = hashlib.sha256()
@@ -72,15 +103,191 @@ class KXPageClient:
         else:
             return {"message": "failed"}
     
-    def fetch_image(self, image_hash: str) -> bytes:
+    def _upload_state(self, session: str) -> Message | None:
         response = requests.get(
-            f"{self._host_url}/api/images/?h={image_hash}",
-            headers={ 'X-Requested-With': 'XMLHttpRequest' }
+            f"{self._host_url}/api/images/upload?session={session}",
+            headers=PBF_HEADER
+        )
+        if response.status_code != 200: return None
+        state: Message = Event_pb2.ImageUploadSession()
+        state.ParseFromString(response.content)
+        return state
+
+    def _upload_session(self, path: str, hashed_filename: str) -> StateResponse:
+        init: Message = Event_pb2.ImageUploadInit()
+        init.token = self._admin_hash
+        init.size = os.path.getsize(path)
+        response = requests.post(
+            f"{self._host_url}/api/images/upload", init.SerializeToString(),
+            headers=PBF_HEADER
+        )
+        if response.status_code != 200: return {"message": "failed"}
+        state: Message = Event_pb2.ImageUploadSession()
+        state.ParseFromString(response.content)
+
+        retries = 0
+        with open(path, "rb") as rd:
+            while state.offset < state.size:
+                rd.seek(state.offset)
+                chunk = rd.read(UPLOAD_CHUNK_SIZE)
+                try:
+                    response = requests.put(
+                        f"{self._host_url}/api/images/upload"
+                        f"?session={state.session}&offset={state.offset}",
+                        data=chunk, headers=PBF_HEADER
+                    )
+                except requests.RequestException:
+                    response = None
+                if response is not None and response.status_code in (200, 409):
+                    # 409 时服务端返回的是它实际收到的进度，按此对齐即可
+                    state.ParseFromString(response.content)
+                    continue
+                retries += 1
+                if retries > UPLOAD_RETRIES: return {"message": "failed"}
+                # 断线后先查询服务端进度，再从该偏移续传
+                try:
+                    resumed = self._upload_state(state.session)
+                except requests.RequestException:
+                    resumed = None
+                if resumed is None: continue
+                state = resumed
+
+        commit: Message = Event_pb2.ImageUploadCommit()
+        commit.token = self._admin_hash
+        commit.session = state.session
+        commit.filename = hashed_filename
+        response = requests.post(
+            f"{self._host_url}/api/images/upload/commit",
+            commit.SerializeToString(), headers=PBF_HEADER
+        )
+        if response.status_code == 200:
+            message: Message = Event_pb2.StateResponse()
+            message.ParseFromString(response.content)
+            return {"message": message.message}
+        else:
+            return {"message": "failed"}
+
+    def images_exist(self, hashes: list[str]) -> list[bool]:
+        found: list[bool] = []
+        for start in range(0, len(hashes), IMAGE_BATCH_MAX):
+            payload: Message = Event_pb2.ImageExists()
+            payload.token = self._admin_hash
+            payload.filenames.extend(hashes[start:start + IMAGE_BATCH_MAX])
+            response = requests.post(
+                f"{self._host_url}/api/images/exists",
+                payload.SerializeToString(), headers=PBF_HEADER
+            )
+            if response.status_code != 200:
+                found.extend([False] * len(payload.filenames))
+                continue
+            result: Message = Event_pb2.ImageExistsResult()
+            result.ParseFromString(response.content)
+            found.extend(result.exists)
+        return found
+
+    def _upload_batch(self, batch: list[tuple[str, str]]) -> list[StateResponse]:
+        payload: Message = Event_pb2.ImageBatchUpload()
+        payload.token = self._admin_hash
+        for path, hashed_filename in batch:
+            image = payload.images.add()
+            image.filename = hashed_filename
+            with open(path, "rb") as rd:
+                image.image = rd.read()
+        response = requests.post(
+            f"{self._host_url}/api/images/batch",
+            payload.SerializeToString(), headers=PBF_HEADER
+        )
+        if response.status_code != 200:
+            return [{"message": "failed"}] * len(batch)
+        result: Message = Event_pb2.ImageBatchResult()
+        result.ParseFromString(response.content)
+        return [{"message": item.message} for item in result.results]
+
+    def upload_images(self, paths: list[str]) -> list[StateResponse]:
+        names = [self._hashed_name(path) for path in paths]
+        results: list[StateResponse] = [{"message": name} for name in names]
+        # 服务端已有的图片直接跳过，其余小图按字节数分批，大图走分块会话
+        unique = list(dict.fromkeys(names))
+        known = {name for name, found in zip(unique, self.images_exist(unique)) if found}
+        pending: dict[str, str] = {}
+        for path, name in zip(paths, names):
+            if name not in known: pending.setdefault(name, path)
+        batches: list[list[tuple[str, str]]] = []
+        large: list[tuple[str, str]] = []
+        size = 0
+        for name, path in pending.items():
+            current = os.path.getsize(path)
+            if current > UPLOAD_SESSION_THRESHOLD:
+                large.append((path, name))
+                continue
+            if not batches or size + current > UPLOAD_BATCH_BYTES \
+                    or len(batches[-1]) >= IMAGE_BATCH_MAX:
+                batches.append([])
+                size = 0
+            batches[-1].append((path, name))
+            size += current
+
+        outcome: dict[str, StateResponse] = {}
+        with ThreadPoolExecutor(UPLOAD_PIPELINE) as executor:
+            for batch, replies in zip(batches, executor.map(self._upload_batch, batches)):
+                for (_, name), reply in zip(batch, replies):
+                    outcome[name] = reply
+        for path, name in large:
+            outcome[name] = self._upload_session(path, name)
+        for index, name in enumerate(names):
+            if name in outcome: results[index] = outcome[name]
+        return results
+
+    def delete_images(self, hashes: list[str]) -> list[StateResponse]:
+        results: list[StateResponse] = []
+        for start in range(0, len(hashes), IMAGE_BATCH_MAX):
+            payload: Message = Event_pb2.ImageBatchDelete()
+            payload.token = self._admin_hash
+            payload.filenames.extend(hashes[start:start + IMAGE_BATCH_MAX])
+            response = requests.post(
+                f"{self._host_url}/api/images/batch/delete",
+                payload.SerializeToString(), headers=PBF_HEADER
+            )
+            if response.status_code != 200:
+                results.extend([{"message": "failed"}] * len(payload.filenames))
+                continue
+            result: Message = Event_pb2.ImageBatchResult()
+            result.ParseFromString(response.content)
+            results.extend({"message": item.message} for item in result.results)
+        return results
+
+    def fetch_image(
+        self, image_hash: str, width: int = 0, height: int = 0,
+        fit: Literal["contain", "cover", "fill"] = "contain"
+    ) -> bytes:
+        url = f"{self._host_url}/api/images/?h={image_hash}"
+        if width or height:
+            url += f"&width={width}&height={height}&fit={fit}"
+        response = requests.get(
+            url, headers={ 'X-Requested-With': 'XMLHttpRequest' }
         )
         if response.status_code == 200:
             return response.content
         return bytes()
 
+    def fetch_image_meta(self, hashes: list[str]) -> dict[str, ImageMeta]:
+        result = {}
+        for i in range(0, len(hashes), IMAGE_BATCH_MAX):
+            response = requests.get(
+                f"{self._host_url}/api/images/meta",
+                params=[("h", name) for name in hashes[i:i + IMAGE_BATCH_MAX]],
+                headers={ 'X-Requested-With': 'XMLHttpRequest' }
+            )
+            if response.status_code != 200: continue
+            metas: Message = Event_pb2.ImageMetaList()
+            metas.ParseFromString(response.content)
+            for item in metas.images:
+                result[item.name] = {
+                    "width": item.width, "height": item.height, "format": item.format,
+                    "size": item.size, "lqip": item.lqip
+                }
+        return result
+
     def delete_image(self, image_hash: str) -> StateResponse:
         body: Message = Event_pb2.ImageDelete()
         body.token = self._admin_hash
@@ -94,34 +301,165 @@ class KXPageClient:
         wrapped.ParseFromString(response.content)
         return { "message": wrapped.message }
 
+    def image_cache_stats(self) -> dict[str, int] | None:
+        payload: Message = Event_pb2.AdminToken()
+        payload.token = self._admin_hash
+        response = requests.post(
+            f"{self._host_url}/api/images/cache",
+            payload.SerializeToString(),
+            headers=PBF_HEADER
+        )
+        if response.status_code != 200: return None
+        stats: Message = Event_pb2.ImageCacheStats()
+        stats.ParseFromString(response.content)
+        return {
+            "hits": stats.hits, "misses": stats.misses, "evictions": stats.evictions,
+            "size": stats.size, "count": stats.count
+        }
+
+    def gc_report(self) -> tuple[list[str], list[tuple[str, str]]] | None:
+        payload: Message = Event_pb2.AdminToken()
+        payload.token = self._admin_hash
+        response = requests.post(
+            f"{self._host_url}/api/images/gc",
+            payload.SerializeToString(),
+            headers=PBF_HEADER
+        )
+        if response.status_code != 200: return None
+        report: Message = Event_pb2.ImageGcReport()
+        report.ParseFromString(response.content)
+        return list(report.orphans), [
+            (event.eventUUID, event.imageHash) for event in report.dangling
+        ]
+
     # Events
 
+    def _fetch_feed(self, url: str) -> Message | None:
+        headers = dict(PBF_HEADER)
+        if cached := self._feed_cache.get(url):
+            headers["If-None-Match"] = cached[0]
+        response = requests.get(self._host_url + url, headers=headers)
+        if response.status_code == 304 and cached:
+            content = cached[1]
+        elif response.status_code == 200:
+            content = response.content
+            if etag := response.headers.get("ETag"):
+                self._feed_cache[url] = (etag, content)
+        else:
+            return None
+        events: Message = Event_pb2.EventList()
+        events.ParseFromString(content)
+        return events
+
+    @staticmethod
+    def _to_spec(item: Message) -> EventSpec:
+        return {
+            "uuid": item.eventUUID,
+            "title": item.eventTitle,
+            "description": item.eventDescription,
+            "href": item.eventHref,
+            "time": item.eventTime,
+            "image": item.imageHash
+        }
+
+    @classmethod
+    def _to_specs(cls, events: Message) -> list[EventSpec]:
+        return [cls._to_spec(item) for item in events.events]
+
+    @staticmethod
+    def _time_query(time_before: str) -> str:
+        given_time = datetime.strptime(time_before, "%Y/%m/%d")
+        time_bytes = given_time.strftime("%Y-%m-%d %H:%M:%S").encode("utf-8")
+        return urlsafe_b64encode(time_bytes).decode("utf-8").rstrip("=")
+
     def fetch_event(self, time_before: str | None = None) -> list[EventSpec]:
         if time_before:
-            given_time = datetime.strptime(time_before, "%Y/%m/%d")
-            time_bytes = given_time.strftime("%Y-%m-%d %H:%M:%S").encode("utf-8")
-            query = urlsafe_b64encode(time_bytes).decode("utf-8")
-            url = f"/api/events/?q={query}"
+            url = f"/api/events/?q={self._time_query(time_before)}"
         else:
             url = "/api/events"
-        url = url.rstrip("=")
+        events = self._fetch_feed(url)
+        return self._to_specs(events) if events is not None else []
+
+    def fetch_event_page(
+        self, limit: int = 50, cursor: str | None = None,
+        time_before: str | None = None
+    ) -> tuple[list[EventSpec], str]:
+        url = f"/api/events/?limit={limit}"
+        if cursor:
+            url += f"&cursor={cursor}"
+        elif time_before:
+            url += f"&q={self._time_query(time_before)}"
+        events = self._fetch_feed(url)
+        if events is None: return [], ""
+        return self._to_specs(events), events.cursor
+
+    def search_events(
+        self, text: str, limit: int = 20, cursor: str | None = None
+    ) -> tuple[list[EventSpec], str]:
+        query = urlsafe_b64encode(text.encode("utf-8")).decode("utf-8").rstrip("=")
+        url = f"{self._host_url}/api/events/search?s={query}&limit={limit}"
+        if cursor: url += f"&cursor={cursor}"
+        response = requests.get(url, headers=PBF_HEADER)
+        if response.status_code != 200: return [], ""
+        events: Message = Event_pb2.EventList()
+        events.ParseFromString(response.content)
+        return self._to_specs(events), events.cursor
+
+    def fetch_events_snapshot(
+        self, time_from: str | None = None, time_to: str | None = None
+    ) -> tuple[list[EventSpec], int]:
+        params = []
+        if time_from: params.append(f"from={self._time_query(time_from)}")
+        if time_to: params.append(f"to={self._time_query(time_to)}")
+        url = "/api/events/export"
+        if params: url += "?" + "&".join(params)
         response = requests.get(self._host_url + url, headers=PBF_HEADER)
-        if response.status_code == 200:
-            results: list[EventSpec] = []
-            events: Message = Event_pb2.EventList()
-            events.ParseFromString(response.content)
-            for item in events.events:
-                results.append({
-                    "uuid": item.eventUUID,
-                    "title": item.eventTitle,
-                    "description": item.eventDescription,
-                    "href": item.eventHref,
-                    "time": item.eventTime,
-                    "image": item.imageHash
-                })
-            return results
-        else:
-            return []
+        if response.status_code != 200: return [], 0
+        events: Message = Event_pb2.EventList()
+        events.ParseFromString(response.content)
+        return self._to_specs(events), events.seq
+
+    def fetch_events_range(
+        self, time_from: str | None = None, time_to: str | None = None
+    ) -> list[EventSpec]:
+        events, _ = self.fetch_events_snapshot(time_from, time_to)
+        return events
+
+    def fetch_changes(
+        self, since: int | None = None, limit: int = 0
+    ) -> tuple[list[tuple[str, EventSpec | None]], int, bool]:
+        url = f"{self._host_url}/api/events/changes?limit={limit}"
+        if since is not None: url += f"&since={since}"
+        response = requests.get(url, headers=PBF_HEADER)
+        response.raise_for_status()
+        result: Message = Event_pb2.EventChanges()
+        result.ParseFromString(response.content)
+        changes: list[tuple[str, EventSpec | None]] = []
+        for change in result.changes:
+            if change.deleted:
+                changes.append((change.eventUUID, None))
+            else:
+                changes.append((change.eventUUID, self._to_spec(change.event)))
+        return changes, result.seq, result.more
+
+    def fetch_change_seq(self) -> int:
+        _, seq, _ = self.fetch_changes()
+        return seq
+
+    def sync_events(
+        self, local: dict[str, EventSpec], since: int
+    ) -> tuple[int, set[str]]:
+        touched: set[str] = set()
+        more = True
+        while more:
+            changes, since, more = self.fetch_changes(since)
+            for uuid, event in changes:
+                touched.add(uuid)
+                if event is None:
+                    local.pop(uuid, None)
+                else:
+                    local[uuid] = event
+        return since, touched
 
     def update_event(
         self,
@@ -154,16 +492,10 @@ class KXPageClient:
         else:
             return {"message": "failed"}
 
-    def append_event(self, events: list[EventSpec]) -> StateResponse:
-        now_str = datetime.now().strftime("%Y/%m/%d")
-
-        for event in events:
-            event["uuid"] = str(random_uuid())
-            event.setdefault("time", now_str)
-            event.setdefault("description", "没有介绍哦~ T^T")
-        
+    def _post_events(self, events: list[EventSpec], upsert: bool) -> StateResponse:
         pack: Message = Event_pb2.EventPost()
         pack.token = self._admin_hash
+        pack.upsert = upsert
         for event in events:
             ev = pack.events.add()
             ev.eventUUID = event["uuid"]
@@ -183,6 +515,61 @@ class KXPageClient:
         else:
             return {"message": "failed"}
 
+    def append_event(self, events: list[EventSpec]) -> StateResponse:
+        now_str = datetime.now().strftime("%Y/%m/%d")
+
+        for event in events:
+            event["uuid"] = str(random_uuid())
+            event.setdefault("time", now_str)
+            event.setdefault("description", "没有介绍哦~ T^T")
+        return self._post_events(events, upsert=False)
+
+    def import_events(
+        self, events: list[EventSpec], upsert: bool = True
+    ) -> StateResponse:
+        now_str = datetime.now().strftime("%Y/%m/%d")
+
+        for event in events:
+            event.setdefault("uuid", str(random_uuid()))
+            event.setdefault("time", now_str)
+            event.setdefault("description", "没有介绍哦~ T^T")
+        return self._post_events(events, upsert=upsert)
+
+    def batch_events(
+        self, operations: list[tuple[Literal["create", "update", "delete"], EventSpec | str]]
+    ) -> list[StateResponse]:
+        now_str = datetime.now().strftime("%Y/%m/%d")
+        pack: Message = Event_pb2.EventBatch()
+        pack.token = self._admin_hash
+        for kind, target in operations:
+            op = pack.operations.add()
+            if kind == "delete":
+                op.delete = str(target)
+                continue
+            ev = op.create if kind == "create" else op.update
+            if kind == "create":
+                target.setdefault("uuid", str(random_uuid()))
+                target.setdefault("time", now_str)
+                target.setdefault("description", "没有介绍哦~ T^T")
+            ev.eventUUID = target["uuid"]
+            if (title := target.get("title", None)): ev.eventTitle = title
+            if (time := target.get("time", None)):
+                # 与 update_event 一致，修改操作的时间使用数据库格式
+                ev.eventTime = time if kind == "create" else \
+                    datetime.strptime(time, "%Y/%m/%d").strftime("%Y-%m-%d %H:%M:%S")
+            if (desc := target.get("description", None)): ev.eventDescription = desc
+            if (ref := target.get("href", None)): ev.eventHref = ref
+            if (img := target.get("image", None)): ev.imageHash = img
+        response = requests.post(
+            f"{self._host_url}/api/events/batch",
+            pack.SerializeToString(), headers=PBF_HEADER
+        )
+        if response.status_code in (200, 409):
+            result: Message = Event_pb2.EventBatchResult()
+            result.ParseFromString(response.content)
+            return [{"message": item.message} for item in result.results]
+        return [{"message": "failed"} for _ in operations]
+
     def delete_event(self, *uuids: UUID | str) -> StateResponse:
         uuids = [str(uuid) for uuid in uuids]
         pack: Message = Event_pb2.EventDelete()
@@ -203,25 +590,41 @@ class KXPageClient:
 
     # Chores
 
-    def get_storage_info(self) -> StorageInfo:
-        payload: Message = Event_pb2.AdminToken()
+    def list_storage(
+        self, prefix: str = "", cursor: str = "", limit: int = 0
+    ) -> tuple[StorageInfo, str] | None:
+        payload: Message = Event_pb2.StorageQuery()
         payload.token = self._admin_hash
+        payload.prefix = prefix
+        payload.cursor = cursor
+        payload.limit = limit
         response = requests.post(
             f"{self._host_url}/api/images/info",
             payload.SerializeToString(),
             headers=PBF_HEADER
         )
-        if response.status_code == 200:
-            result: Message = Event_pb2.StorageInfo()
-            result.ParseFromString(response.content)
-            return {
-                "size": result.size,
-                "count": result.count,
-                "files": list(result.files)
-            }
-        else:
+        if response.status_code != 200: return None
+        result: Message = Event_pb2.StorageInfo()
+        result.ParseFromString(response.content)
+        return {
+            "size": result.size,
+            "original": result.original,
+            "count": result.count,
+            "files": list(result.files)
+        }, result.cursor
+
+    def get_storage_info(self, prefix: str = "") -> StorageInfo:
+        page = self.list_storage(prefix)
+        if page is None:
             return {
                 "size": -1,
+                "original": 0,
                 "count": 0,
                 "files": []
-            } 
+            }
+        info, cursor = page
+        # 服务端按文件名分页，这里取完所有页
+        while cursor and (page := self.list_storage(prefix, cursor)):
+            info["files"].extend(page[0]["files"])
+            cursor = page[1]
+        return info
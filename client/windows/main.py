@@ -12,6 +12,8 @@ from ..network import KXPageClient, StorageInfo, EventSpec as KXEvent, StateResp
 from ..config import theme, WINDOW_SIZE
 
 IMAGE_FORMAT = ("JPEG", "PNG", "GIF", "BMP", "WEBP")
+EVENT_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 50
 
 class Main(Component):
 
@@ -19,9 +21,10 @@ class Main(Component):
     _events: dict[str, KXEvent]
     _table_items: dict[str, TreeviewItem]
     _current_time: str | None
+    _cursor: str | None
+    _seq: int | None
     _storage_items: dict[str, TreeviewItem]
     _current_hash: str
-    _current_image: bytes
 
     status_bar: Label
     st_display: Label
@@ -40,6 +43,9 @@ class Main(Component):
     event_refresh_button: Button
     image_select_display: Entry
 
+    search_entry: Entry
+    search_button: Button
+
     create_event_button: Button
     edit_event_button: Button
     remove_event_button: Button
@@ -52,7 +58,7 @@ class Main(Component):
         response: StorageInfo = None
     ):
         self._client = client or KXPageClient()
-        self._init_storage = response or {"size": 0, "count": 0, "files": []}
+        self._init_storage = response or {"size": 0, "original": 0, "count": 0, "files": []}
 
     def update_storage(self) -> None:
 
@@ -60,8 +66,10 @@ class Main(Component):
             self.status_bar.text = "储存信息更新完毕。"
             self.refresh_button.disabled = False
             self.delete_image_button.disabled = False
+            saved = response['original'] - response['size']
             self.st_display.text = \
 f"""总大小：{response['size'] / 1048576:.2f} MB
+优化节省：{saved / 1048576:.2f} MB
 图片数量：{response['count']} 张"""
             for item in self._storage_items.values():
                 item.delete()
@@ -81,19 +89,31 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
 
     def update_events(self) -> None:
 
-        def cb(response: list[KXEvent]):
-            self.event_fetch_button.disabled = False
-            for event in response:
+        def task() -> tuple[list[KXEvent], str, int | None]:
+            seq = self._client.fetch_change_seq() if self._seq is None else None
+            events, cursor = self._client.fetch_event_page(
+                EVENT_PAGE_SIZE, self._cursor
+            )
+            return events, cursor, seq
+
+        def cb(response: tuple[list[KXEvent], str, int | None]):
+            events, cursor, seq = response
+            self._cursor = cursor
+            if seq is not None: self._seq = seq
+            self.event_fetch_button.disabled = not cursor
+            for event in events:
                 uuid = event["uuid"]
                 if uuid not in self._events:
                     self._table_items[uuid] = self.table.insert(
                         name=uuid, values=(event["time"], event["title"])
                     )
                     self._events[uuid] = event
-            if response:
-                self.time_label.text = f"截至 {response[-1]['time']}"
-                self._current_time = response[-1]['time']
-            self.status_bar.text = f"事件更新完毕，新增条数：{len(response)}。"
+            if events:
+                self.time_label.text = f"截至 {events[-1]['time']}"
+                self._current_time = events[-1]['time']
+            self.status_bar.text = f"事件更新完毕，新增条数：{len(events)}。"
+            if not cursor:
+                self.status_bar.text += "已加载全部事件。"
 
         def on_exception(e: Exception):
             self.event_fetch_button.disabled = False
@@ -102,10 +122,7 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
 
         self.event_fetch_button.disabled = True
         self.status_bar.text = "更新事件中..."
-        ftk.promise(
-            self._client.fetch_event, cb, on_exception,
-            args=(self._current_time ,)
-        )
+        ftk.promise(task, cb, on_exception)
 
     def clear_event_select(self) -> None:
         self.save_image_button.disabled = True
@@ -142,17 +159,17 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
             self.image_display.text = "No image."
 
     def fetch_save_image(self) -> None:
-        raw = self._client.fetch_image(self._current_hash)
-        bio = io.BytesIO(raw)
-        image = Image.open(bio, formats=IMAGE_FORMAT)
         height, width = (
             self.image_display.widget.winfo_height(),
             self.image_display.widget.winfo_width()
         )
+        # 只请求与展示区域相当的缩略图，保存时再下载原图
+        raw = self._client.fetch_image(self._current_hash, width, height)
+        bio = io.BytesIO(raw)
+        image = Image.open(bio, formats=IMAGE_FORMAT)
         ratio = min(height / image.height, width / image.width)
         height = int(ratio * image.height)
         width = int(ratio * image.width)
-        self._current_image = raw
 
         tk_image = ImageTk.PhotoImage(image.resize((width, height)))
         self.image_display.image = tk_image
@@ -176,18 +193,34 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
     def save_image(self) -> None:
         _, ext = self._current_hash.split('.')
         self.status_bar.text = "发起保存文件对话框..."
-        writer = filedialog.asksaveasfile(
-            "wb",
+        # 只取路径，下载成功后再写文件，失败时不留下空文件
+        path = filedialog.asksaveasfilename(
             defaultextension=ext, initialdir="./", title="保存图片",
             initialfile=self._current_hash,
             filetypes=((f"{ext.upper()}格式图片", f"*.{ext}"),)
         )
-        if writer:
-            writer.write(self._current_image)
-            writer.close()
-            self.status_bar.text = f"图片已保存至：{writer.name}。"
-        else:
+        if not path:
             self.status_bar.text = "保存已取消。"
+            return None
+
+        def cb(raw: bytes) -> None:
+            self.save_image_button.disabled = False
+            # fetch_image 在非 200 响应时返回空字节
+            if not raw:
+                self.status_bar.text = "下载原图失败，图片未保存。"
+                return None
+            with open(path, "wb") as writer:
+                writer.write(raw)
+            self.status_bar.text = f"图片已保存至：{path}。"
+
+        def ex(e: Exception) -> None:
+            self.save_image_button.disabled = False
+            self.status_bar.text = f"下载原图出错：{e.__class__.__name__}，详见控制台。"
+            raise e
+
+        self.save_image_button.disabled = True
+        self.status_bar.text = f"正在下载原图：{self._current_hash}..."
+        ftk.promise(self._client.fetch_image, cb, ex, args=(self._current_hash, ))
     
     def update_image_selection(self, items: list[TreeviewItem]) -> None:
         if not items:
@@ -203,7 +236,7 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
         self.status_bar.text = "发起确认删除对话框..."
         confirm = messagebox.askokcancel(
             "确认删除",
-            f"确认删除图片“{name}”吗？\n此操作不会检查事件对图片的依赖。",
+            f"确认删除图片“{name}”吗？\n仍被事件引用的图片会被服务端拒绝删除。",
             icon=messagebox.WARNING
         )
         if not confirm:
@@ -239,26 +272,12 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
 
     def refresh_all(self) -> None:
         
-        def task() -> None:
-            stop_before = int(
-                datetime.strptime(self._current_time, "%Y/%m/%d").timestamp()
-            )
-            updated_events = []
-            timestamp = 0
-            time_before = None
-            while timestamp < stop_before:
-                events = self._client.fetch_event(time_before)
-                updated_events.extend(events)
-                if events:
-                    time_before = events[-1]["time"]
-                    timestamp = int(
-                        datetime.strptime(time_before, "%Y/%m/%d").timestamp()
-                    )
-                else:
-                    break
-            return updated_events
+        def task() -> tuple[list[KXEvent], int]:
+            return self._client.fetch_events_snapshot(self._current_time)
 
-        def cb(events: list[KXEvent]) -> None:
+        def cb(response: tuple[list[KXEvent], int]) -> None:
+            events, seq = response
+            self._seq = seq
             self.event_refresh_button.disabled = False
             self.table.disabled = False
             self.status_bar.text = f"刷新事件成功。"
@@ -273,7 +292,9 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
                     name=uuid, values=(event["time"], event["title"])
                 )
             self._events = new_map
-            self.time_label.text = f"截至 {events[-1]['time']}"
+            if events:
+                self._current_time = events[-1]['time']
+                self.time_label.text = f"截至 {events[-1]['time']}"
 
         def ex(e: Exception) -> None:
             self.event_refresh_button.disabled = False
@@ -292,6 +313,86 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
         self.status_bar.text = f"刷新事件中..."
         ftk.promise(task, cb, ex)
 
+    def search_events(self) -> None:
+        text = self.search_entry.text.strip()
+        if not text:
+            self.status_bar.text = "请输入搜索关键词。"
+            return None
+
+        def cb(response: tuple[list[KXEvent], str]) -> None:
+            events, _ = response
+            self.search_button.disabled = False
+            matched = []
+            for event in events:
+                uuid = event["uuid"]
+                if uuid not in self._table_items:
+                    index = sum(
+                        1 for other in self._table_items
+                        if self._events[other]["time"] > event["time"]
+                    )
+                    self._table_items[uuid] = self.table.insert(
+                        index=index, name=uuid,
+                        values=(event["time"], event["title"])
+                    )
+                self._events[uuid] = event
+                matched.append(self._table_items[uuid])
+            self.table.selection = matched
+            self.status_bar.text = f"搜索“{text}”完毕，命中条数：{len(events)}。"
+
+        def ex(e: Exception) -> None:
+            self.search_button.disabled = False
+            self.status_bar.text = f"搜索事件时出错：{e.__class__.__name__}，详见控制台。"
+            raise e
+
+        self.search_button.disabled = True
+        self.status_bar.text = f"正在搜索“{text}”..."
+        ftk.promise(
+            self._client.search_events, cb, ex,
+            args=(text, SEARCH_PAGE_SIZE)
+        )
+
+    def sync_events(self) -> None:
+        if self._seq is None:
+            self.refresh_all()
+            return None
+
+        def task() -> tuple[dict[str, KXEvent], int, set[str]]:
+            local = dict(self._events)
+            seq, touched = self._client.sync_events(local, self._seq)
+            return local, seq, touched
+
+        def cb(response: tuple[dict[str, KXEvent], int, set[str]]) -> None:
+            local, seq, touched = response
+            self._seq = seq
+            for uuid in sorted(touched):
+                event = local.get(uuid)
+                item = self._table_items.get(uuid)
+                if event is None:
+                    if item:
+                        item.delete()
+                        del self._table_items[uuid]
+                elif item:
+                    item["time"] = event["time"]
+                    item["title"] = event["title"]
+                else:
+                    index = sum(
+                        1 for other in self._table_items
+                        if other in local and local[other]["time"] > event["time"]
+                    )
+                    self._table_items[uuid] = self.table.insert(
+                        index=index, name=uuid,
+                        values=(event["time"], event["title"])
+                    )
+            self._events = local
+            self.status_bar.text = f"事件同步完毕，变更条数：{len(touched)}。"
+
+        def ex(e: Exception) -> None:
+            self.status_bar.text = f"同步事件时出错：{e.__class__.__name__}，详见控制台。"
+            raise e
+
+        self.status_bar.text = "同步事件中..."
+        ftk.promise(task, cb, ex)
+
     def upload_image(self) -> None:
         self.status_bar.text = "发起文件选择对话框..."
         path = filedialog.askopenfilename(title="选择文件", initialdir="./")
@@ -328,7 +429,7 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
         
         def cb(response: StateResponse):
             self.create_event_button.disabled = False
-            self.refresh_all()
+            self.sync_events()
 
         def ex(e: Exception):
             self.create_event_button.disabled = False
@@ -347,7 +448,7 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
         
         def cb(response: StateResponse):
             self.edit_event_button.disabled = False
-            self.refresh_all()
+            self.sync_events()
 
         def ex(e: Exception):
             self.edit_event_button.disabled = False
@@ -389,24 +490,32 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
         self.window.wm_withdraw()
 
     def remove_event(self) -> None:
-        
-        uuid = self.table.selection[0].name
-        title = self.table.selection[0]["title"]
+        # 选中的事件通过批量接口在一个请求、一个事务里删除，逐项报告结果
+        selected = [(item.name, item["title"]) for item in self.table.selection]
+        if len(selected) == 1:
+            uuid, title = selected[0]
+            prompt = f"确认删除事件：\"{title}\"({uuid}) 吗？"
+        else:
+            prompt = f"确认删除选中的 {len(selected)} 个事件吗？"
 
         self.status_bar.text = "发起确认对话框..."
-        confirm = messagebox.askokcancel(
-            "确认删除",
-            f"确认删除事件：\"{title}\"({uuid}) 吗？",
-            icon=messagebox.WARNING
-        )
+        confirm = messagebox.askokcancel("确认删除", prompt, icon=messagebox.WARNING)
         if not confirm:
             self.status_bar.text = "已取消删除事件。"
             return None
 
-        def cb(response: StateResponse):
-            self.status_bar.text = f"已删除事件：\"{title}\"({uuid})。"
+        def cb(results: list[StateResponse]):
+            failed = [
+                f"\"{title}\"：{result['message']}"
+                for (_, title), result in zip(selected, results)
+                if result["message"] != "success"
+            ]
+            if failed:
+                self.status_bar.text = f"部分事件未删除：{'；'.join(failed)}。"
+            else:
+                self.status_bar.text = f"已删除 {len(selected)} 个事件。"
             self.remove_event_button.disabled = False
-            self.refresh_all()
+            self.sync_events()
     
         def ex(e: Exception):
             self.status_bar.text = f"删除事件时出错：{e.__class__.__name__}，详见控制台。"
@@ -415,7 +524,10 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
 
         self.status_bar.text = "正在删除事件..."
         self.remove_event_button.disabled = True
-        ftk.promise(self._client.delete_event, cb, ex, args=(uuid, ))
+        ftk.promise(
+            self._client.batch_events, cb, ex,
+            args=([("delete", uuid) for uuid, _ in selected], )
+        )
 
 
     
@@ -424,9 +536,13 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
         self._events = {}
         self._storage_items = {}
         self._current_time = None
+        self._cursor = None
+        self._seq = None
         response = self._init_storage
+        saved = response['original'] - response['size']
         self.st_display.text = \
 f"""总大小：{response['size'] / 1048576:.2f} MB
+优化节省：{saved / 1048576:.2f} MB
 图片数量：{response['count']} 张"""
         for file in response["files"]:
             self._storage_items[file] = self.storage_list.insert(values=(file, ))
@@ -515,6 +631,15 @@ f"""总大小：{response['size'] / 1048576:.2f} MB
                     text="刷新已有事件", tags="in_right",
                     on_click=self.refresh_all, ref="event_refresh_button"
                 ),
+                Label(text="事件搜索"),
+                Entry(
+                    ref="search_entry",
+                    style={"font_size": 15, "input_width": 12, "margin": (0, 10)}
+                ),
+                Button(
+                    text="搜索", tags="in_right",
+                    on_click=self.search_events, ref="search_button"
+                ),
                 Label(text="事件操作"),
                 Button(
                     tags="in_right", text="创建事件",
@@ -0,0 +1,61 @@
+
+import sys
+import time
+import pymysql
+from app.config import MYSQL_HOST, MYSQL_PORT, MYSQL_AUTH, IMAGE_STORE, IMAGE_GC_GRACE
+from app.v1.images import image_store
+from app.v1.images.store import FileStore
+from app.v1.images.manifest import reconcile
+from app.v1.images.gc import find_orphans, find_dangling
+
+USAGE = """usage: python image_tools.py <command>
+
+commands:
+  reconcile    按图片库目录修正 images 清单与汇总
+  shard        把平铺的图片移入 ab/cd/ 分片目录，服务运行时也可执行
+  gc           列出孤立图片与引用了不存在图片的事件，不做删除
+"""
+
+def connect() -> pymysql.connections.Connection:
+    user, password = MYSQL_AUTH.split(':')
+    return pymysql.connect(
+        host=MYSQL_HOST, port=MYSQL_PORT, user=user, password=password,
+        database="kxpage"
+    )
+
+def run_reconcile() -> None:
+    db = connect()
+    image_store.load()
+    added, removed, changed = reconcile(db, image_store)
+    db.close()
+    print(f"added {added}, removed {removed}, updated {changed}")
+
+def run_shard() -> None:
+    store = FileStore(IMAGE_STORE)
+    store.load()
+    print(f"moved {store.migrate()} files, restart the server to drop flat lookups")
+
+def run_gc() -> None:
+    db = connect()
+    cursor = db.cursor()
+    deadline = time.time() - IMAGE_GC_GRACE
+    orphans = find_orphans(cursor, time.time(), 1 << 31)
+    expired = set(find_orphans(cursor, deadline, 1 << 31))
+    for name in orphans:
+        print(f"orphan   {name}{'  (past grace)' if name in expired else ''}")
+    for uuid, image_hash in find_dangling(cursor, 1 << 31):
+        print(f"dangling {uuid} -> {image_hash}")
+    cursor.close()
+    db.close()
+
+COMMANDS = {
+    "reconcile": run_reconcile,
+    "shard": run_shard,
+    "gc": run_gc,
+}
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(USAGE)
+        sys.exit(1)
+    COMMANDS[sys.argv[1]]()
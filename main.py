@@ -1,10 +1,25 @@
 
+from contextlib import asynccontextmanager
+from app import schema
+from app.pool import pool
+from app.config import SCHEMA_AUTO_MIGRATE
 from app.v1.events import event_router
-from app.v1.images import image_router
+from app.v1.images import image_router, images_startup, images_shutdown
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await pool.open()
+    if SCHEMA_AUTO_MIGRATE:
+        await pool.run(schema.migrate)
+    await pool.run(schema.verify)
+    await images_startup()
+    yield
+    images_shutdown()
+    pool.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(event_router)
 app.include_router(image_router)
@@ -15,6 +30,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 @app.get("/api/")
@@ -0,0 +1,73 @@
+
+import os
+from app.v1.images.packs import PackStore, HEADER, PUT
+
+def reopen(root: str, pack_size: int) -> PackStore:
+    store = PackStore(root, pack_size)
+    store.load()
+    return store
+
+def test_load_replays_puts_and_deletes(tmp_path):
+    store = reopen(tmp_path, 1024 * 1024)
+    store.put(b"alpha", "a.png")
+    store.put(b"beta", "b.png")
+    store.remove("a.png")
+
+    store = reopen(tmp_path, 1024 * 1024)
+    assert not store.exists("a.png")
+    assert bytes(store.get("b.png").data) == b"beta"
+    assert set(store.scan()) == {"b.png"}
+
+def test_append_truncates_torn_tail(tmp_path):
+    store = reopen(tmp_path, 1024 * 1024)
+    store.put(b"alpha", "a.png")
+    path = os.path.join(tmp_path, "pack-000001.kxp")
+    intact = os.path.getsize(path)
+    # 模拟写到一半崩溃：只写了记录头和部分文件名
+    with open(path, "ab") as wt:
+        wt.write(HEADER.pack(PUT, 5, 4, 0.0) + b"b.p")
+
+    store = reopen(tmp_path, 1024 * 1024)
+    assert bytes(store.get("a.png").data) == b"alpha"
+    assert not store.exists("b.png")
+    store.put(b"beta", "b.png")
+    assert os.path.getsize(path) == intact + HEADER.size + len("b.png") + 4
+
+    store = reopen(tmp_path, 1024 * 1024)
+    assert bytes(store.get("a.png").data) == b"alpha"
+    assert bytes(store.get("b.png").data) == b"beta"
+
+def test_compact_keeps_tombstones_for_older_packs(tmp_path):
+    store = reopen(tmp_path, 500)
+    # 包 1：a 与大文件 c，删除 a 后失效比例仍低，不会被压缩
+    store.put(b"x" * 10, "a.png")
+    store.put(b"c" * 1000, "c.png")
+    # 包 2：a 的墓碑与随后删除的 d，整包失效
+    store.remove("a.png")
+    store.put(b"d" * 1000, "d.png")
+    store.remove("d.png")
+
+    reclaimed = store.compact(0.5)
+    assert reclaimed > 0
+    assert not os.path.exists(os.path.join(tmp_path, "pack-000002.kxp"))
+    assert os.path.exists(os.path.join(tmp_path, "pack-000001.kxp"))
+
+    # 包 1 里 a 的 PUT 还在，墓碑没有随包 2 一起丢失，重放后 a 不会复活
+    store = reopen(tmp_path, 500)
+    assert not store.exists("a.png")
+    assert not store.exists("d.png")
+    assert bytes(store.get("c.png").data) == b"c" * 1000
+
+def test_compact_moves_live_records(tmp_path):
+    store = reopen(tmp_path, 100)
+    store.put(b"a" * 150, "a.png")
+    store.put(b"b" * 150, "b.png")
+    store.put(b"c" * 150, "c.png")
+    store.remove("b.png")
+
+    store.compact(0.5)
+    assert not os.path.exists(os.path.join(tmp_path, "pack-000002.kxp"))
+    store = reopen(tmp_path, 100)
+    assert set(store.scan()) == {"a.png", "c.png"}
+    assert bytes(store.get("a.png").data) == b"a" * 150
+    assert bytes(store.get("c.png").data) == b"c" * 150